@@ -0,0 +1,105 @@
+import copy
+import json
+import time
+import argparse
+from dataclasses import dataclass, asdict, fields
+
+import bnd2
+
+# Importing synthetic puts src on the path.
+from synthetic import BundleSettings, generate_bundle, generate_resource_entries
+
+from conversion import CONVERTER_CLASSES, convert_bundle, clear_conversion_memo, get_converter_class
+from resource_ids import HashIdAllocator
+
+
+@dataclass
+class Result:
+    name: str = None
+    resources_count: int = None
+    bytes_count: int = None
+    seconds: float = None
+
+    @property
+    def resources_per_second(self) -> float:
+        return self.resources_count / self.seconds if self.seconds > 0 else float('inf')
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes_count / self.seconds / (1024 * 1024) if self.seconds > 0 else float('inf')
+
+
+def get_size(resource_entry: bnd2.ResourceEntry) -> int:
+    return sum(len(data) for data in resource_entry.data if data is not None)
+
+
+def benchmark_converter(converter_class: type, resource_entries: list[bnd2.ResourceEntry], repeats: int) -> Result:
+    # Every repeat converts fresh copies, the copying isn't timed. The best repeat is reported.
+    best_seconds = float('inf')
+    for _ in range(repeats):
+        copies = copy.deepcopy(resource_entries)
+        start = time.perf_counter()
+        for resource_entry in copies:
+            converter_class(resource_entry).convert()
+        best_seconds = min(best_seconds, time.perf_counter() - start)
+    return Result(converter_class.__name__, len(resource_entries), sum(get_size(resource_entry) for resource_entry in resource_entries), best_seconds)
+
+
+def benchmark_convert_bundle(bundles: list[bnd2.BundleV2], repeats: int) -> Result:
+    best_seconds = float('inf')
+    for _ in range(repeats):
+        copies = copy.deepcopy(bundles)
+        id_allocator = HashIdAllocator()
+        # Every repeat starts like a fresh worker process.
+        clear_conversion_memo()
+        start = time.perf_counter()
+        for bundle in copies:
+            convert_bundle(bundle, {}, id_allocator)
+        best_seconds = min(best_seconds, time.perf_counter() - start)
+    resources_count = sum(len(bundle.resource_entries) for bundle in bundles)
+    bytes_count = sum(get_size(resource_entry) for bundle in bundles for resource_entry in bundle.resource_entries)
+    return Result('convert_bundle', resources_count, bytes_count, best_seconds)
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Measures the throughput of the converters on synthetic D3D9 resources.')
+    defaults = BundleSettings()
+    for field in fields(BundleSettings):
+        parser.add_argument(f'--{field.name.replace("_", "-")}', type=int, default=getattr(defaults, field.name), metavar='N')
+    parser.add_argument('-b', '--bundles', type=int, default=8, metavar='N', help='bundles converted end to end')
+    parser.add_argument('-s', '--scale', type=int, default=16, metavar='N', help='bundles worth of resources converted per converter')
+    parser.add_argument('-r', '--repeats', type=int, default=3, metavar='N', help='the best of the repeats is reported')
+    parser.add_argument('--json', metavar='FILE', help='also write the results to a JSON file')
+    return parser.parse_args()
+
+
+def main() -> None:
+    arguments = parse_arguments()
+    settings = BundleSettings(**{field.name: getattr(arguments, field.name) for field in fields(BundleSettings)})
+
+    resource_entries = [resource_entry for seed in range(arguments.scale) for resource_entry in generate_resource_entries(settings, seed)]
+    results = []
+    for resource_type in CONVERTER_CLASSES:
+        converter_resource_entries = [resource_entry for resource_entry in resource_entries if resource_entry.type == resource_type]
+        if len(converter_resource_entries) > 0:
+            results.append(benchmark_converter(get_converter_class(resource_type), converter_resource_entries, arguments.repeats))
+
+    # The bundle output goes nowhere, bundles are only converted in memory.
+    bundles = [generate_bundle(f'synthetic_{seed}.BNDL', settings, seed) for seed in range(arguments.bundles)]
+    results.append(benchmark_convert_bundle(bundles, arguments.repeats))
+
+    print(f'{"":<18}{"resources":>10}{"MB":>10}{"seconds":>10}{"resources/s":>14}{"MB/s":>10}')
+    for result in results:
+        print(f'{result.name:<18}{result.resources_count:>10}{result.bytes_count / (1024 * 1024):>10.1f}{result.seconds:>10.4f}{result.resources_per_second:>14.0f}{result.megabytes_per_second:>10.1f}')
+
+    if arguments.json is not None:
+        report = {
+            'settings': asdict(settings),
+            'results': [dict(asdict(result), resources_per_second=result.resources_per_second, megabytes_per_second=result.megabytes_per_second) for result in results],
+        }
+        with open(arguments.json, 'w') as fp:
+            json.dump(report, fp, indent=4)
+
+
+if __name__ == '__main__':
+    main()
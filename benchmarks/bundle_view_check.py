@@ -0,0 +1,95 @@
+import os
+import sys
+import glob
+import argparse
+import tempfile
+
+import bnd2
+
+# Importing synthetic puts src on the path.
+from synthetic import BundleSettings, generate_bundle
+
+from bundle_view import BundleView
+
+
+# The attributes BundleView sets on the resource entries it builds, compared with the ones bnd2 loads.
+RESOURCE_ENTRY_ATTRIBUTES = (
+    'id',
+    'import_hash',
+    'uncompressed_size_and_alignment',
+    'size_and_alignment_on_disk',
+    'disk_offset',
+    'import_offset',
+    'type',
+    'import_count',
+    'flags',
+    'stream_index',
+)
+
+
+def get_import_entries(resource_entry: bnd2.ResourceEntry) -> list[tuple[int, int]]:
+    return [(import_entry.id, import_entry.offset) for import_entry in resource_entry.import_entries]
+
+
+def compare_resource_entries(view_entry: bnd2.ResourceEntry, bundle_entry: bnd2.ResourceEntry, header_only: bool) -> list[str]:
+    differences = []
+    for name in RESOURCE_ENTRY_ATTRIBUTES:
+        view_value, bundle_value = getattr(view_entry, name), getattr(bundle_entry, name)
+        if isinstance(bundle_value, tuple):
+            bundle_value = list(bundle_value)
+        if view_value != bundle_value:
+            differences.append(f'{name} is {view_value!r} instead of {bundle_value!r}')
+    for i, (view_data, bundle_data) in enumerate(zip(view_entry.data, bundle_entry.data)):
+        if header_only and i > 0:
+            if view_data is not None:
+                differences.append(f'data[{i}] was read with header_only')
+        elif (bytes(view_data) if view_data is not None else None) != (bytes(bundle_data) if bundle_data is not None else None):
+            differences.append(f'data[{i}] differs')
+    if get_import_entries(view_entry) != get_import_entries(bundle_entry):
+        differences.append('import entries differ')
+    return differences
+
+
+def check_bundle(file_name: str) -> list[str]:
+    # Every resource entry of the view, whole and header only, has to match the one bnd2 loads.
+    bundle = bnd2.BundleV2(file_name)
+    bundle.load()
+    errors = []
+    with BundleView(file_name) as bundle_view:
+        if bundle_view.resource_ids != [resource_entry.id for resource_entry in bundle.resource_entries]:
+            return [f"{file_name}: the resource IDs differ."]
+        for entry_index, bundle_entry in enumerate(bundle.resource_entries):
+            if bundle_view.get_resource_type_at(entry_index) != bundle_entry.type or bundle_view.get_import_count_at(entry_index) != len(bundle_entry.import_entries):
+                errors.append(f"{file_name}: resource {bundle_entry.id :08X} has a different type or import count.")
+            for header_only in (False, True):
+                view_entry = bundle_view.get_resource_entry_at(entry_index, header_only)
+                for difference in compare_resource_entries(view_entry, bundle_entry, header_only):
+                    errors.append(f"{file_name}: resource {bundle_entry.id :08X}{' (header only)' if header_only else ''}: {difference}.")
+    return errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Checks that BundleView reads the same resource entries as bnd2. Without bundles, a synthetic bundle saved by bnd2 is checked.')
+    parser.add_argument('bundles', nargs='*', help='bundles or glob patterns to check')
+    arguments = parser.parse_args()
+
+    file_names = [file_name for pattern in arguments.bundles for file_name in sorted(glob.glob(pattern))]
+    with tempfile.TemporaryDirectory() as directory:
+        if len(file_names) == 0:
+            bundle = generate_bundle(os.path.join(directory, 'SYNTHETIC.BNDL'), BundleSettings())
+            bundle.save()
+            file_names.append(bundle.file_name)
+
+        errors = []
+        for file_name in file_names:
+            errors.extend(check_bundle(file_name))
+
+    for error in errors:
+        print(error)
+    print(f"Checked {len(file_names)} bundle(s), {len(errors)} difference(s).")
+    if len(errors) > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+from dataclasses import dataclass, asdict
+
+
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Modules which must not be imported when a process starts, only once they are used.
+DEFERRED_MODULES = (
+    'tkinter',
+    'numpy',
+    'converters.texture.texture',
+    'converters.vertex_descriptor.vertex_descriptor',
+    'converters.renderable.renderable',
+    'converters.texture_state.texture_state',
+    'converters.material_state.material_state',
+)
+
+
+@dataclass
+class ImportTime:
+    module_name: str = None
+    self_microseconds: int = None
+    cumulative_microseconds: int = None
+
+
+def measure_import_times(module_name: str) -> list[ImportTime]:
+    # Parses the report of 'python -X importtime', written to stderr.
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (SOURCE_DIRECTORY, os.environ.get('PYTHONPATH')))))
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module_name}'], env=environment, capture_output=True, text=True, check=True)
+    import_times = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_microseconds, cumulative_microseconds, imported_module_name = line[len('import time:'):].split('|')
+        import_times.append(ImportTime(imported_module_name.strip(), int(self_microseconds), int(cumulative_microseconds)))
+    return import_times
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Measures the import time of the converter, as paid by every process it starts.')
+    parser.add_argument('-m', '--module', default='main', help='module to import (default: %(default)s)')
+    parser.add_argument('-r', '--repeats', type=int, default=5, metavar='N', help='the best of the repeats is reported')
+    parser.add_argument('-n', '--top', type=int, default=10, metavar='N', help='slowest imports listed')
+    parser.add_argument('--budget', type=float, default=150, metavar='MS', help='fail if importing takes longer (default: %(default)s)')
+    parser.add_argument('--json', metavar='FILE', help='also write the results to a JSON file')
+    return parser.parse_args()
+
+
+def main() -> None:
+    arguments = parse_arguments()
+
+    best_import_times = None
+    for _ in range(arguments.repeats):
+        import_times = measure_import_times(arguments.module)
+        if best_import_times is None or import_times[-1].cumulative_microseconds < best_import_times[-1].cumulative_microseconds:
+            best_import_times = import_times
+    total_milliseconds = best_import_times[-1].cumulative_microseconds / 1000
+
+    print(f'{"":<48}{"self ms":>10}{"total ms":>10}')
+    for import_time in sorted(best_import_times, key=lambda import_time: -import_time.self_microseconds)[:arguments.top]:
+        print(f'{import_time.module_name:<48}{import_time.self_microseconds / 1000:>10.1f}{import_time.cumulative_microseconds / 1000:>10.1f}')
+    print(f'Importing {arguments.module} takes {total_milliseconds :.1f} ms, the budget is {arguments.budget :.1f} ms.')
+
+    imported_module_names = {import_time.module_name for import_time in best_import_times}
+    deferred_module_names = [module_name for module_name in DEFERRED_MODULES if module_name in imported_module_names]
+    for module_name in deferred_module_names:
+        print(f'{module_name} is imported at startup.')
+
+    if arguments.json is not None:
+        report = {
+            'module': arguments.module,
+            'total_milliseconds': total_milliseconds,
+            'budget_milliseconds': arguments.budget,
+            'imports': [asdict(import_time) for import_time in best_import_times],
+        }
+        with open(arguments.json, 'w') as fp:
+            json.dump(report, fp, indent=4)
+
+    if total_milliseconds > arguments.budget or len(deferred_module_names) > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+import os
+import sys
+import random
+import argparse
+from dataclasses import dataclass, fields
+
+import bnd2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from converters.buffer import BufferWriter
+from converters.texture import d3d9 as texture_d3d9
+from converters.vertex_descriptor import d3d9 as vertex_descriptor_d3d9
+from converters.renderable import d3d9 as renderable_d3d9
+from converters.texture_state import d3d9 as texture_state_d3d9
+from converters.material_state import d3d9 as material_state_d3d9
+from converters.material_state.material_state import D3D9_MATERIAL_STATE_ID_TO_D3D11_ALPHA_TO_COVERAGE_ENABLE
+
+
+MATERIAL_STATE_IDS = sorted(D3D9_MATERIAL_STATE_ID_TO_D3D11_ALPHA_TO_COVERAGE_ENABLE)
+
+# Bytes per 4x4 block, all mips are stored one after another.
+TEXTURE_FORMAT_BLOCK_SIZES = {
+    texture_d3d9.TextureFormat.A8R8G8B8: 64,
+    texture_d3d9.TextureFormat.DXT1: 8,
+    texture_d3d9.TextureFormat.DXT5: 16,
+}
+
+# The elements of a typical vertex, repeated when more elements are requested.
+VERTEX_ELEMENTS = [
+    (vertex_descriptor_d3d9.ElementType.POSITION, vertex_descriptor_d3d9.DataType.FLOAT3, 12),
+    (vertex_descriptor_d3d9.ElementType.NORMAL, vertex_descriptor_d3d9.DataType.SHORT4N, 8),
+    (vertex_descriptor_d3d9.ElementType.TEXCOORD_0, vertex_descriptor_d3d9.DataType.FLOAT2, 8),
+    (vertex_descriptor_d3d9.ElementType.TEXCOORD_1, vertex_descriptor_d3d9.DataType.SHORT2N, 4),
+    (vertex_descriptor_d3d9.ElementType.TANGENT, vertex_descriptor_d3d9.DataType.SHORT4N, 8),
+    (vertex_descriptor_d3d9.ElementType.BLEND_INDICES, vertex_descriptor_d3d9.DataType.UBYTE4, 4),
+    (vertex_descriptor_d3d9.ElementType.BLEND_WEIGHT, vertex_descriptor_d3d9.DataType.UBYTE4N, 4),
+]
+
+
+@dataclass
+class BundleSettings:
+    textures_count: int = 16
+    texture_size: int = 256
+    vertex_descriptors_count: int = 8
+    vertex_elements_count: int = 5
+    renderables_count: int = 16
+    meshes_count: int = 4
+    vertices_count: int = 1024
+    indices_count: int = 3072
+    texture_states_count: int = 16
+    material_states_count: int = len(MATERIAL_STATE_IDS)
+
+
+def create_resource_entry(resource_id: int, resource_type: int, data: list[bytes], import_ids: list[int] = ()) -> bnd2.ResourceEntry:
+    resource_entry = bnd2.ResourceEntry()
+    resource_entry.id = resource_id
+    resource_entry.type = resource_type
+    resource_entry.data = data
+    resource_entry.import_entries = []
+    for import_id in import_ids:
+        import_entry = bnd2.ImportEntry()
+        import_entry.id = import_id
+        import_entry.offset = 0
+        resource_entry.import_entries.append(import_entry)
+    resource_entry.import_count = len(resource_entry.import_entries)
+    return resource_entry
+
+
+def generate_texture(resource_id: int, size: int, format: texture_d3d9.TextureFormat = texture_d3d9.TextureFormat.DXT1) -> bnd2.ResourceEntry:
+    mipmap_levels_count = size.bit_length()
+    header = texture_d3d9.TEXTURE_LAYOUT.pack(
+        format=format,
+        width=size,
+        height=size,
+        depth=1,
+        mipmap_levels_count=mipmap_levels_count,
+        type=texture_d3d9.TextureType.TEXTURE,
+    )
+    pixels_size = sum(max(1, (size >> mip) // 4) ** 2 for mip in range(mipmap_levels_count)) * TEXTURE_FORMAT_BLOCK_SIZES[format]
+    return create_resource_entry(resource_id, 0, [header, bytes(pixels_size), b''])
+
+
+def get_vertex_elements(elements_count: int) -> list[tuple[vertex_descriptor_d3d9.ElementType, vertex_descriptor_d3d9.DataType, int]]:
+    return [VERTEX_ELEMENTS[i % len(VERTEX_ELEMENTS)] for i in range(elements_count)]
+
+
+def get_vertex_stride(elements_count: int) -> int:
+    return sum(size for _, _, size in get_vertex_elements(elements_count))
+
+
+def generate_vertex_descriptor(resource_id: int, elements_count: int) -> bnd2.ResourceEntry:
+    elements = get_vertex_elements(elements_count)
+    vertex_stride = get_vertex_stride(elements_count)
+
+    data = BufferWriter(0x10 + elements_count * vertex_descriptor_d3d9.ELEMENT_LAYOUT.size)
+    data.write(vertex_descriptor_d3d9.VERTEX_DESCRIPTOR_LAYOUT, 0x0, elements_hash=0, elements_count=elements_count)
+    offset = 0
+    for i, (element_type, data_type, size) in enumerate(elements):
+        element = vertex_descriptor_d3d9.Element(vertex_stride=vertex_stride, offset=offset, data_type=data_type, type=element_type)
+        data.write(vertex_descriptor_d3d9.ELEMENT_LAYOUT, 0x10 + i * vertex_descriptor_d3d9.ELEMENT_LAYOUT.size, element)
+        offset += size
+    return create_resource_entry(resource_id, 10, [bytes(data.buffer), b'', b''])
+
+
+def generate_renderable(resource_id: int, meshes_count: int, material_ids: list[int], vertex_descriptor_ids: list[int], vertices_count: int, indices_count: int, vertex_elements_count: int, seed: int = 0) -> bnd2.ResourceEntry:
+    generator = np.random.default_rng(seed)
+
+    meshes_offset = bnd2.util.align_offset(renderable_d3d9.RENDERABLE_LAYOUT.size, 0x10)
+    index_buffer_offset = meshes_offset + 4 * meshes_count
+    vertex_buffer_offset = index_buffer_offset + renderable_d3d9.INDEX_BUFFER_LAYOUT.size
+    first_mesh_offset = bnd2.util.align_offset(vertex_buffer_offset + renderable_d3d9.VERTEX_BUFFER_LAYOUT.size, 0x10)
+    meshes_offsets = first_mesh_offset + renderable_d3d9.MESH_DTYPE.itemsize * np.arange(meshes_count, dtype=np.int64)
+
+    # Every mesh uses one vertex descriptor and draws its share of the indices.
+    meshes = np.zeros(meshes_count, dtype=renderable_d3d9.MESH_DTYPE)
+    meshes['transformation'] = generator.random((meshes_count, 16), dtype=np.float32)
+    primitives_count = indices_count // 3 // max(meshes_count, 1)
+    meshes['start_index'] = 3 * primitives_count * np.arange(meshes_count)
+    meshes['primitives_count'] = primitives_count
+    meshes['vertex_descriptors_count'] = 1
+
+    index_format = renderable_d3d9.IndexFormat.INDEX_16 if vertices_count <= 0x10000 else renderable_d3d9.IndexFormat.INDEX_32
+    indices = generator.integers(0, vertices_count, indices_count).astype('<u2' if index_format == renderable_d3d9.IndexFormat.INDEX_16 else '<u4')
+    # The vertices have the layout of the generated vertex descriptors.
+    vertices_size = vertices_count * get_vertex_stride(vertex_elements_count)
+
+    data = BufferWriter(int(meshes_offsets[-1]) + renderable_d3d9.MESH_DTYPE.itemsize if meshes_count > 0 else first_mesh_offset)
+    data.write(renderable_d3d9.RENDERABLE_LAYOUT, 0x0, bounding_sphere=(0.0, 0.0, 0.0, 1.0), meshes_count=meshes_count, meshes_offset=meshes_offset, flags=0, index_buffer_offset=index_buffer_offset, vertex_buffer_offset=vertex_buffer_offset)
+    data.write(renderable_d3d9.INDEX_BUFFER_LAYOUT, index_buffer_offset, indices_count=indices_count, data_offset=0, format=index_format)
+    data.write(renderable_d3d9.VERTEX_BUFFER_LAYOUT, vertex_buffer_offset, data_offset=indices.nbytes, data_size=vertices_size)
+    data.write_numpy(meshes_offset, meshes_offsets.astype('<u4'))
+    data.write_records(meshes_offsets, meshes)
+
+    # Each mesh imports its material first and then its vertex descriptors.
+    import_ids = []
+    for i in range(meshes_count):
+        import_ids.append(material_ids[i % len(material_ids)])
+        import_ids.append(vertex_descriptor_ids[i % len(vertex_descriptor_ids)])
+
+    buffers = indices.tobytes() + generator.bytes(vertices_size)
+    return create_resource_entry(resource_id, 12, [bytes(data.buffer), buffers, b''], import_ids)
+
+
+def generate_texture_state(resource_id: int, texture_id: int) -> bnd2.ResourceEntry:
+    data = texture_state_d3d9.SAMPLER_STATE_LAYOUT.pack(
+        address_mode_u=texture_state_d3d9.TextureAddressMode.WRAP,
+        address_mode_v=texture_state_d3d9.TextureAddressMode.CLAMP,
+        magnification_filter=texture_state_d3d9.TextureFilterType.LINEAR,
+        minification_filter=texture_state_d3d9.TextureFilterType.ANISOTROPIC,
+        max_anisotropy=8,
+        mipmap_lod_bias=-0.5,
+    )
+    return create_resource_entry(resource_id, 14, [data, b'', b''], [texture_id])
+
+
+def generate_material_state(resource_id: int) -> bnd2.ResourceEntry:
+    # The converter looks the material state ID up, so only the known IDs can be used.
+    assert resource_id in D3D9_MATERIAL_STATE_ID_TO_D3D11_ALPHA_TO_COVERAGE_ENABLE, f"Material state ID {resource_id :08X} isn't known."
+    blend_state_offset = material_state_d3d9.MATERIAL_STATE_LAYOUT.size
+    depth_stencil_state_offset = blend_state_offset + material_state_d3d9.BLEND_STATE_LAYOUT.size
+    rasterizer_state_offset = depth_stencil_state_offset + material_state_d3d9.DEPTH_STENCIL_STATE_LAYOUT.size
+
+    data = BufferWriter(rasterizer_state_offset + material_state_d3d9.RASTERIZER_STATE_LAYOUT.size)
+    data.write(material_state_d3d9.MATERIAL_STATE_LAYOUT, 0x0, blend_state_offset=blend_state_offset, depth_stencil_state_offset=depth_stencil_state_offset, rasterizer_state_offset=rasterizer_state_offset)
+    data.write(material_state_d3d9.BLEND_STATE_LAYOUT, blend_state_offset, source_blend=material_state_d3d9.Blend.SRC_ALPHA, destination_blend=material_state_d3d9.Blend.INV_SRC_ALPHA, alpha_blend_enable=True, alpha_to_coverage_enable=False)
+    data.write(material_state_d3d9.DEPTH_STENCIL_STATE_LAYOUT, depth_stencil_state_offset, z_write_enable=True)
+    data.write(material_state_d3d9.RASTERIZER_STATE_LAYOUT, rasterizer_state_offset, cull_mode=material_state_d3d9.CullMode.CW)
+    return create_resource_entry(resource_id, 15, [bytes(data.buffer), b'', b''])
+
+
+def generate_material(resource_id: int, material_state_id: int, texture_state_id: int) -> bnd2.ResourceEntry:
+    # Only the material's own ID is patched by the conversion, the rest is opaque.
+    data = bytearray(0x20)
+    data[0x4:0x8] = resource_id.to_bytes(4, 'little')
+    return create_resource_entry(resource_id, 1, [bytes(data), b'', b''], [material_state_id, texture_state_id])
+
+
+def generate_resource_ids(count: int, generator: random.Random, used_ids: set[int]) -> list[int]:
+    resource_ids = []
+    while len(resource_ids) < count:
+        resource_id = generator.randint(0x00000001, 0xFFFFFFFE)
+        if resource_id not in used_ids:
+            used_ids.add(resource_id)
+            resource_ids.append(resource_id)
+    return resource_ids
+
+
+def generate_resource_entries(settings: BundleSettings, seed: int = 0) -> list[bnd2.ResourceEntry]:
+    # Generates a self-contained set of resources: every import points to a resource of the set.
+    assert 1 <= settings.material_states_count <= len(MATERIAL_STATE_IDS), f"A bundle can hold 1 to {len(MATERIAL_STATE_IDS)} material states."
+    assert settings.textures_count > 0 and settings.vertex_descriptors_count > 0 and settings.texture_states_count > 0, "A bundle needs at least one texture, vertex descriptor and texture state."
+    generator = random.Random(seed)
+    material_state_ids = MATERIAL_STATE_IDS[:settings.material_states_count]
+    used_ids = set(material_state_ids)
+    texture_ids = generate_resource_ids(settings.textures_count, generator, used_ids)
+    vertex_descriptor_ids = generate_resource_ids(settings.vertex_descriptors_count, generator, used_ids)
+    texture_state_ids = generate_resource_ids(settings.texture_states_count, generator, used_ids)
+    material_ids = generate_resource_ids(settings.material_states_count, generator, used_ids)
+    renderable_ids = generate_resource_ids(settings.renderables_count, generator, used_ids)
+
+    resource_entries = []
+    resource_entries += [generate_texture(resource_id, settings.texture_size) for resource_id in texture_ids]
+    resource_entries += [generate_vertex_descriptor(resource_id, settings.vertex_elements_count) for resource_id in vertex_descriptor_ids]
+    resource_entries += [generate_texture_state(resource_id, texture_ids[i % len(texture_ids)]) for i, resource_id in enumerate(texture_state_ids)]
+    resource_entries += [generate_material_state(resource_id) for resource_id in material_state_ids]
+    resource_entries += [generate_material(resource_id, material_state_ids[i], texture_state_ids[i % len(texture_state_ids)]) for i, resource_id in enumerate(material_ids)]
+    resource_entries += [generate_renderable(resource_id, settings.meshes_count, material_ids, vertex_descriptor_ids, settings.vertices_count, settings.indices_count, settings.vertex_elements_count, seed + i) for i, resource_id in enumerate(renderable_ids)]
+    return resource_entries
+
+
+def generate_bundle(file_name: str, settings: BundleSettings, seed: int = 0) -> bnd2.BundleV2:
+    # The bundle is only built in memory, call save() to write it.
+    bundle = bnd2.BundleV2(file_name)
+    bundle.resource_entries = generate_resource_entries(settings, seed)
+    return bundle
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Writes synthetic D3D9 bundles, for example to benchmark the command line conversion.')
+    parser.add_argument('output', help='directory to write the bundles to')
+    parser.add_argument('-b', '--bundles', type=int, default=8, metavar='N')
+    defaults = BundleSettings()
+    for field in fields(BundleSettings):
+        parser.add_argument(f'--{field.name.replace("_", "-")}', type=int, default=getattr(defaults, field.name), metavar='N')
+    arguments = parser.parse_args()
+    settings = BundleSettings(**{field.name: getattr(arguments, field.name) for field in fields(BundleSettings)})
+
+    os.makedirs(arguments.output, exist_ok=True)
+    for seed in range(arguments.bundles):
+        generate_bundle(os.path.join(arguments.output, f'SYNTHETIC_{seed}.BNDL'), settings, seed).save()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,400 @@
+import collections
+import concurrent.futures
+import contextlib
+import cProfile
+import glob
+import io
+import os
+import shutil
+import time
+import traceback
+from dataclasses import dataclass
+
+import bnd2
+
+from conversion import CONVERTER_VERSION, ConversionOptions, convert_bundle, is_converted_bundle_file
+from conversion_cache import ConversionCache
+from external_index import ExternalIndex, ExternalResources, hash_file
+from manifest import BuildManifest
+from metrics import Metrics
+from resource_ids import IdAllocator, RandomIdAllocator, HashIdAllocator, load_id_map, save_id_map
+
+
+@dataclass
+class Options:
+    input_patterns: list[str] = None
+    external_patterns: list[str] = None
+    output_directory: str = None
+    cache_directory: str = None
+    cache_size: int = None
+    file_pattern: str = None
+    workers_count: int = None
+    resource_workers_count: int = None
+    id_mode: str = None
+    id_salt: str = None
+    id_map_file_name: str = None
+    force: bool = None
+    profile_directory: str = None
+    track_memory: bool = None
+    memory_budget: int = None
+    repack_vertex_buffers: bool = None
+    narrow_index_buffers: bool = None
+    max_texture_size: int = None
+    deduplicate_resources: bool = None
+
+    @property
+    def index_file_name(self) -> str:
+        return os.path.join(self.cache_directory, 'external_index.json')
+
+    @property
+    def manifest_file_name(self) -> str:
+        return os.path.join(self.cache_directory, 'manifest.json')
+
+    @property
+    def metrics_file_name(self) -> str:
+        return os.path.join(self.cache_directory, 'metrics.json')
+
+    @property
+    def prometheus_file_name(self) -> str:
+        return os.path.join(self.cache_directory, 'metrics.prom')
+
+    @property
+    def settings(self) -> str:
+        # Everything besides the input and external bundles which affects the output.
+        settings = f'converter={CONVERTER_VERSION};ids={self.id_mode}:{self.id_salt}'
+        if self.repack_vertex_buffers:
+            settings += ';repack_vertex_buffers'
+        if self.narrow_index_buffers:
+            settings += ';narrow_index_buffers'
+        if self.max_texture_size is not None:
+            settings += f';max_texture_size={self.max_texture_size}'
+        if self.deduplicate_resources:
+            settings += ';deduplicate_resources'
+        return settings
+
+    @property
+    def conversion_options(self) -> ConversionOptions:
+        return ConversionOptions(
+            repack_vertex_buffers=self.repack_vertex_buffers,
+            narrow_index_buffers=self.narrow_index_buffers,
+            max_texture_size=self.max_texture_size,
+            deduplicate_resources=self.deduplicate_resources,
+        )
+
+    @property
+    def conversion_cache(self) -> ConversionCache | None:
+        if self.cache_size <= 0:
+            return None
+        return ConversionCache(os.path.join(self.cache_directory, 'conversions'), self.cache_size, CONVERTER_VERSION)
+
+
+MIB = 1024 * 1024
+
+# Assumed memory per input byte until a bundle was converted with memory tracking.
+DEFAULT_MEMORY_PER_INPUT_BYTE = 8
+
+
+@dataclass
+class Job:
+    name: str = None
+    input_file_name: str = None
+    output_file_name: str = None
+
+
+@dataclass
+class JobResult:
+    job: Job = None
+    succeeded: bool = None
+    log: str = None
+    allocated_ids: dict[str, int] = None
+    input_hash: str = None
+    external_resources: dict[int, str | None] = None
+    metrics: Metrics = None
+
+
+def collect_file_names(patterns: list[str], file_pattern: str) -> list[tuple[str, str]]:
+    # Returns (file name, file name relative to the matched root) pairs.
+    # Directories are searched recursively, so the relative name keeps their layout.
+    file_names: list[tuple[str, str]] = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for file_name in sorted(glob.glob(os.path.join(pattern, '**', file_pattern), recursive=True)):
+                if os.path.isfile(file_name):
+                    file_names.append((file_name, os.path.relpath(file_name, pattern)))
+        elif os.path.isfile(pattern):
+            file_names.append((pattern, os.path.basename(pattern)))
+        else:
+            for file_name in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(file_name):
+                    file_names.append((file_name, os.path.basename(file_name)))
+
+    unique_file_names: list[tuple[str, str]] = []
+    seen: set[str] = set()
+    for file_name, relative_name in file_names:
+        key = os.path.normcase(os.path.abspath(file_name))
+        if key not in seen:
+            seen.add(key)
+            unique_file_names.append((file_name, relative_name))
+    return unique_file_names
+
+
+def create_jobs(input_patterns: list[str], output_directory: str, file_pattern: str) -> list[Job]:
+    jobs: list[Job] = []
+    output_file_names: dict[str, str] = {}
+    for input_file_name, relative_name in collect_file_names(input_patterns, file_pattern):
+        output_file_name = os.path.join(output_directory, relative_name)
+        key = os.path.normcase(os.path.abspath(output_file_name))
+        if key in output_file_names:
+            raise ValueError(f"Bundles '{output_file_names[key]}' and '{input_file_name}' would both be written to '{output_file_name}'.")
+        output_file_names[key] = input_file_name
+        jobs.append(Job(relative_name.replace(os.sep, '/'), input_file_name, output_file_name))
+    return jobs
+
+
+# Each worker process reads the external index once and keeps the locations of
+# the external resources for every job it runs. The bundles are mapped per job.
+_external_resources: dict[tuple[str, tuple[str, ...]], ExternalResources] = {}
+
+
+def get_external_resources(index_file_name: str, external_file_names: list[str]) -> ExternalResources:
+    key = (index_file_name, tuple(external_file_names))
+    if key not in _external_resources:
+        _external_resources.clear()
+        external_index = ExternalIndex(index_file_name)
+        external_index.load()
+        _external_resources[key] = ExternalResources(external_index.locate(external_file_names))
+    return _external_resources[key]
+
+
+def update_external_index(index_file_name: str, external_file_names: list[str]) -> ExternalIndex:
+    external_index = ExternalIndex(index_file_name)
+    external_index.load()
+    updated_count = external_index.update(external_file_names)
+    external_index.save()
+    print(f"Indexed external bundles ({updated_count} of {len(external_file_names)} updated).")
+    return external_index
+
+
+_id_map: dict[str, dict[str, int]] = {}
+
+
+def create_id_allocator(options: Options, used_ids: dict[int, str] = None) -> IdAllocator:
+    if options.id_mode == 'random':
+        return RandomIdAllocator(used_ids)
+
+    if options.id_map_file_name not in _id_map:
+        _id_map.clear()
+        _id_map[options.id_map_file_name] = load_id_map(options.id_map_file_name)
+    return HashIdAllocator(options.id_salt, _id_map[options.id_map_file_name], used_ids)
+
+
+def convert_bundle_file(job: Job, options: Options, external_file_names: list[str], used_ids: dict[int, str] = None) -> JobResult:
+    # Runs in a worker process. The output is captured so the parent can print
+    # the logs of all bundles in input order instead of interleaved.
+    log = io.StringIO()
+    metrics = Metrics(options.track_memory)
+    profiler = cProfile.Profile() if options.profile_directory is not None else None
+    try:
+        with contextlib.redirect_stdout(log):
+            if profiler is not None:
+                profiler.enable()
+            print(f"Converting bundle '{job.input_file_name}'...")
+            with metrics.measure('bundle'):
+                input_hash = hash_file(job.input_file_name)
+                # An already converted bundle is copied as it is, without loading all of it.
+                if is_converted_bundle_file(job.input_file_name, metrics):
+                    print("The bundle is already converted, it's copied as it is.")
+                    os.makedirs(os.path.dirname(os.path.abspath(job.output_file_name)), exist_ok=True)
+                    shutil.copyfile(job.input_file_name, job.output_file_name)
+                    allocated_ids = {}
+                    external_resources = {}
+                else:
+                    bundle = bnd2.BundleV2(job.input_file_name)
+                    with metrics.measure('load'):
+                        bundle.load()
+                    metrics.add_bytes('load', None, bytes_in=os.path.getsize(job.input_file_name))
+                    id_allocator = create_id_allocator(options, used_ids)
+                    # The external bundles are unmapped once the bundle is converted, their resources are copies.
+                    with get_external_resources(options.index_file_name, external_file_names) as located_external_resources:
+                        external_resources = convert_bundle(bundle, located_external_resources, id_allocator, options.conversion_cache, job.name, metrics, options.conversion_options, options.resource_workers_count or 1)
+                    os.makedirs(os.path.dirname(os.path.abspath(job.output_file_name)), exist_ok=True)
+                    bundle.file_name = job.output_file_name
+                    with metrics.measure('save'):
+                        bundle.save()
+                    metrics.add_bytes('save', None, bytes_out=os.path.getsize(job.output_file_name))
+                    del bundle
+                    allocated_ids = id_allocator.allocated_ids
+            if profiler is not None:
+                profiler.disable()
+                profile_file_name = os.path.join(options.profile_directory, f'{job.name}.prof')
+                os.makedirs(os.path.dirname(os.path.abspath(profile_file_name)), exist_ok=True)
+                profiler.dump_stats(profile_file_name)
+            print(f"Saved '{job.output_file_name}'.")
+            if options.track_memory:
+                bundle_metrics = metrics.stages[('bundle', None)]
+                print(f"Peak memory {bundle_metrics.peak_memory / MIB :.1f} MiB, retained {bundle_metrics.retained_memory / MIB :.1f} MiB.")
+        return JobResult(job, True, log.getvalue(), allocated_ids, input_hash, external_resources, metrics)
+    except Exception:
+        if profiler is not None:
+            profiler.disable()
+        log.write(f"Failed to convert bundle '{job.input_file_name}'.\n")
+        log.write(traceback.format_exc())
+        return JobResult(job, False, log.getvalue())
+
+
+# Estimates the memory a bundle needs to convert from the size of its file.
+# With memory tracking, the estimate follows the highest peak per input byte
+# measured so far.
+class MemoryBudget:
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.memory_per_input_byte = DEFAULT_MEMORY_PER_INPUT_BYTE
+        self._measured = False
+
+
+    def estimate(self, job: Job) -> int:
+        return int(os.path.getsize(job.input_file_name) * self.memory_per_input_byte)
+
+
+    def update(self, job: Job, peak_memory: int) -> None:
+        input_size = os.path.getsize(job.input_file_name)
+        if input_size == 0 or peak_memory == 0:
+            return
+        memory_per_input_byte = peak_memory / input_size
+        self.memory_per_input_byte = max(self.memory_per_input_byte, memory_per_input_byte) if self._measured else memory_per_input_byte
+        self._measured = True
+
+
+def run(options: Options) -> int:
+    try:
+        jobs = create_jobs(options.input_patterns, options.output_directory, options.file_pattern)
+    except ValueError as error:
+        print(error)
+        return 1
+    if len(jobs) == 0:
+        print("No bundles to convert.")
+        return 1
+
+    external_file_names = [file_name for file_name, _ in collect_file_names(options.external_patterns, options.file_pattern)]
+    external_index = update_external_index(options.index_file_name, external_file_names)
+    external_locations = external_index.locate(external_file_names)
+    external_hashes = {file_name: indexed_bundle.content_hash for file_name, indexed_bundle in external_index.bundles.items()}
+
+    # Every worker only knows the IDs of the ID map, so IDs allocated by different
+    # workers can collide. The bundles are checked in input order and a bundle whose
+    # IDs collide with an earlier one is converted again knowing all used IDs and the keys owning them.
+    id_map = load_id_map(options.id_map_file_name)
+    used_ids: dict[int, str] = {new_id: key for key, new_id in id_map.items()}
+    failed_jobs: list[Job] = []
+    colliding_jobs: list[Job] = []
+
+    # Bundles whose input, external bundles and settings didn't change since they were built are skipped.
+    manifest = BuildManifest(options.manifest_file_name)
+    manifest.load()
+    pending_jobs: list[Job] = []
+    for job in jobs:
+        record = None if options.force else manifest.get_up_to_date_record(job.input_file_name, job.output_file_name, options.settings, external_locations, external_hashes)
+        if record is None:
+            pending_jobs.append(job)
+            continue
+        for key, new_id in record.allocated_ids.items():
+            used_ids[new_id] = key
+        id_map.update(record.allocated_ids)
+
+    workers_count = max(min(options.workers_count or os.cpu_count() or 1, len(pending_jobs)), 1)
+    print(f"Converting {len(pending_jobs)} bundle(s) with {len(external_file_names)} external bundle(s) using {workers_count} worker(s), {len(jobs) - len(pending_jobs)} bundle(s) are up to date...")
+
+    # The metrics of every conversion, including the ones which were repeated because of collisions.
+    metrics = Metrics()
+    start = time.perf_counter()
+    done_count = 0
+    # The peak and retained memory of every bundle, when memory is tracked.
+    bundles_memory: dict[str, dict[str, int]] = {}
+
+    def add_result(result: JobResult) -> None:
+        nonlocal done_count
+        print(result.log, end='', flush=True)
+        if result.metrics is not None:
+            metrics.merge(result.metrics)
+            if options.track_memory:
+                bundle_metrics = result.metrics.stages[('bundle', None)]
+                bundles_memory[result.job.name] = {'peak_memory': bundle_metrics.peak_memory, 'retained_memory': bundle_metrics.retained_memory}
+        if not result.succeeded:
+            failed_jobs.append(result.job)
+            manifest.remove(result.job.output_file_name)
+        elif any(used_ids.get(new_id, key) != key for key, new_id in result.allocated_ids.items()):
+            # Counted once it's converted again.
+            print(f"Resource IDs of bundle '{result.job.input_file_name}' collide with other bundles, converting it again.")
+            colliding_jobs.append(result.job)
+            return
+        else:
+            for key, new_id in result.allocated_ids.items():
+                used_ids[new_id] = key
+            id_map.update(result.allocated_ids)
+            manifest.update(result.job.input_file_name, result.input_hash, result.job.output_file_name, options.settings, result.external_resources, external_hashes, result.allocated_ids)
+        done_count += 1
+        resources_count = metrics.get_count('convert')
+        print(f"[{done_count}/{len(pending_jobs)}] {resources_count} resource(s), {resources_count / (time.perf_counter() - start) :.0f} resources/s.")
+
+    # Without a budget all bundles are submitted at once. With one, a bundle is held back
+    # while the estimates of the bundles in progress would exceed the budget.
+    # One bundle is always let through, so a bundle larger than the budget converts on its own.
+    # The memory of a bundle is released as soon as it's finished, whatever its position.
+    memory_budget = MemoryBudget(options.memory_budget) if options.memory_budget is not None else None
+    queued_jobs = collections.deque(enumerate(pending_jobs))
+    running_jobs: dict[concurrent.futures.Future, tuple[int, Job, int]] = {}
+    running_memory = 0
+    # Finished results wait here for the bundles before them, so the logs are in input order.
+    finished_results: dict[int, JobResult] = {}
+    next_result_index = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers_count) as executor:
+        while len(queued_jobs) > 0 or len(running_jobs) > 0:
+            while len(queued_jobs) > 0:
+                job_index, job = queued_jobs[0]
+                estimate = memory_budget.estimate(job) if memory_budget is not None else 0
+                if memory_budget is not None and len(running_jobs) > 0 and running_memory + estimate > memory_budget.budget:
+                    break
+                queued_jobs.popleft()
+                running_jobs[executor.submit(convert_bundle_file, job, options, external_file_names)] = (job_index, job, estimate)
+                running_memory += estimate
+
+            done_futures, _ = concurrent.futures.wait(running_jobs, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done_futures:
+                job_index, job, estimate = running_jobs.pop(future)
+                running_memory -= estimate
+                try:
+                    result = future.result()
+                except Exception:
+                    # The worker process itself died (e.g. it was killed by the OS).
+                    result = JobResult(job, False, f"Failed to convert bundle '{job.input_file_name}'.\n{traceback.format_exc()}")
+                if memory_budget is not None and result.metrics is not None:
+                    memory_budget.update(job, result.metrics.get_peak_memory('bundle'))
+                finished_results[job_index] = result
+
+            while next_result_index in finished_results:
+                add_result(finished_results.pop(next_result_index))
+                next_result_index += 1
+
+    while len(colliding_jobs) > 0:
+        job = colliding_jobs.pop(0)
+        add_result(convert_bundle_file(job, options, external_file_names, dict(used_ids)))
+
+    if options.id_map_file_name is not None:
+        save_id_map(options.id_map_file_name, id_map)
+    manifest.save()
+
+    conversion_cache = options.conversion_cache
+    if conversion_cache is not None:
+        conversion_cache.evict()
+
+    metrics.save_json(options.metrics_file_name, seconds=time.perf_counter() - start, bundles_count=len(pending_jobs), failed_bundles_count=len(failed_jobs), bundles_memory=bundles_memory)
+    metrics.save_prometheus(options.prometheus_file_name)
+    if len(metrics.stages) > 0:
+        print(f"Time per stage (see '{options.metrics_file_name}'):")
+        metrics.print_summary()
+
+    print(f"Converted {len(jobs) - len(failed_jobs)} of {len(jobs)} bundle(s).")
+    for job in failed_jobs:
+        print(f"Failed: '{job.input_file_name}'")
+    return 1 if len(failed_jobs) > 0 else 0
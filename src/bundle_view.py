@@ -0,0 +1,145 @@
+import mmap
+import zlib
+import struct
+
+import bnd2
+
+
+HEADER_STRUCT = struct.Struct('<4sLLLLL3LL')
+RESOURCE_ENTRY_STRUCT = struct.Struct('<QQ3L3L3LLLHBB')
+IMPORT_ENTRY_STRUCT = struct.Struct('<QLL')
+
+BUNDLE_FLAG_COMPRESSED = 0x1
+
+
+# Read-only view of a bnd2 PC file which maps the file into memory and parses only
+# the header and the resource entries table up front. The data blocks of a resource
+# are read (and decompressed) only when its ResourceEntry is requested, so memory
+# scales with the resources which are actually used, not with the size of the file.
+class BundleView:
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.flags: int = None
+        self.resource_data_offsets: tuple[int, int, int] = None
+        self.resource_ids: list[int] = []
+        self._resource_entries: list[tuple] = []
+        self._resource_entry_indices: dict[int, int] = {}
+        self._file = None
+        self._mmap: mmap.mmap = None
+
+
+    def open(self) -> None:
+        self._file = open(self.file_name, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._load_resource_entries()
+        except Exception:
+            self.close()
+            raise
+
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+    def __enter__(self) -> 'BundleView':
+        self.open()
+        return self
+
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+    def get_resource_type_at(self, entry_index: int) -> int:
+        return self._resource_entries[entry_index][12]
+
+
+    def get_import_count_at(self, entry_index: int) -> int:
+        return self._resource_entries[entry_index][13]
+
+
+    def get_resource_entry(self, resource_id: int) -> bnd2.ResourceEntry | None:
+        entry_index = self._resource_entry_indices.get(resource_id)
+        if entry_index is None:
+            return None
+        return self.get_resource_entry_at(entry_index)
+
+
+    def get_resource_entry_at(self, entry_index: int, header_only: bool = False) -> bnd2.ResourceEntry:
+        # With header_only, only data[0] (which holds the imports too) is read, the other blocks are None.
+        (
+            resource_id, import_hash,
+            uncompressed_size_0, uncompressed_size_1, uncompressed_size_2,
+            disk_size_0, disk_size_1, disk_size_2,
+            disk_offset_0, disk_offset_1, disk_offset_2,
+            import_offset, resource_type, import_count, flags, stream_index,
+        ) = self._resource_entries[entry_index]
+
+        resource_entry = bnd2.ResourceEntry()
+        resource_entry.id = resource_id
+        resource_entry.import_hash = import_hash
+        resource_entry.uncompressed_size_and_alignment = [uncompressed_size_0, uncompressed_size_1, uncompressed_size_2]
+        resource_entry.size_and_alignment_on_disk = [disk_size_0, disk_size_1, disk_size_2]
+        resource_entry.disk_offset = [disk_offset_0, disk_offset_1, disk_offset_2]
+        resource_entry.import_offset = import_offset
+        resource_entry.type = resource_type
+        resource_entry.import_count = import_count
+        resource_entry.flags = flags
+        resource_entry.stream_index = stream_index
+        resource_entry.data = [
+            self._read_data(i, disk_offset, disk_size, uncompressed_size) if i == 0 or not header_only else None
+            for i, (disk_offset, disk_size, uncompressed_size) in enumerate(zip(resource_entry.disk_offset, resource_entry.size_and_alignment_on_disk, resource_entry.uncompressed_size_and_alignment))
+        ]
+
+        # The import entries are stored at the end of the first data block.
+        resource_entry.import_entries = []
+        if import_count > 0:
+            for i in range(import_count):
+                import_id, import_entry_offset, _ = IMPORT_ENTRY_STRUCT.unpack_from(resource_entry.data[0], import_offset + i * IMPORT_ENTRY_STRUCT.size)
+                import_entry = bnd2.ImportEntry()
+                import_entry.id = import_id
+                import_entry.offset = import_entry_offset
+                resource_entry.import_entries.append(import_entry)
+            resource_entry.data[0] = resource_entry.data[0][:import_offset]
+
+        return resource_entry
+
+
+    def _load_resource_entries(self) -> None:
+        magic, version, platform, _, resource_entries_count, resource_entries_offset, *resource_data_offsets, flags = HEADER_STRUCT.unpack_from(self._mmap, 0x0)
+        assert magic == b'bnd2', f"File '{self.file_name}' isn't a bnd2 bundle."
+        assert version == 2 and platform == 1, f"Bundle '{self.file_name}' isn't a version 2 PC bundle."
+        self.flags = flags
+        self.resource_data_offsets = tuple(resource_data_offsets)
+
+        self._resource_entries = [
+            RESOURCE_ENTRY_STRUCT.unpack_from(self._mmap, resource_entries_offset + i * RESOURCE_ENTRY_STRUCT.size)
+            for i in range(resource_entries_count)
+        ]
+        self.resource_ids = [resource_entry[0] for resource_entry in self._resource_entries]
+        self._resource_entry_indices = {}
+        for entry_index, resource_id in enumerate(self.resource_ids):
+            self._resource_entry_indices.setdefault(resource_id, entry_index)
+
+
+    def _read_data(self, block_index: int, disk_offset: int, size_and_alignment_on_disk: int, uncompressed_size_and_alignment: int) -> bytes:
+        size = size_and_alignment_on_disk & 0x0FFFFFFF
+        if size == 0:
+            return b''
+
+        offset = self.resource_data_offsets[block_index] + disk_offset
+        with memoryview(self._mmap) as view:
+            block = view[offset:offset + size]
+            try:
+                if self.flags & BUNDLE_FLAG_COMPRESSED:
+                    return zlib.decompress(block, bufsize=uncompressed_size_and_alignment & 0x0FFFFFFF)
+                return bytes(block)
+            finally:
+                block.release()
@@ -0,0 +1,290 @@
+import struct
+import os
+import time
+import functools
+import importlib
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+
+import bnd2
+
+from bundle_view import BundleView
+from conversion_cache import ConversionCache
+from conversion_memo import ConversionMemo
+from deduplication import DEDUPLICATED_RESOURCE_TYPES, get_content_hashes, remove_duplicate_resource_entries
+from external_index import ExternalResources, locate_external_resources
+from metrics import Metrics, get_resource_size
+from resource_ids import IdAllocator
+
+
+# Bump whenever a converter starts producing different output,
+# so cached conversions from older versions aren't reused.
+CONVERTER_VERSION = 2
+
+
+# Maximum number of converted resources kept in memory by every process.
+CONVERSION_MEMO_SIZE = 4096
+
+
+# The module and class of the converter of every resource type. A converter module
+# (and NumPy with it) is imported when its type is converted for the first time,
+# which keeps short-lived processes from paying for converters they never use.
+CONVERTER_CLASSES = {
+    0: ('converters.texture.texture', 'Texture'),
+    10: ('converters.vertex_descriptor.vertex_descriptor', 'VertexDescriptor'),
+    12: ('converters.renderable.renderable', 'Renderable'),
+    14: ('converters.texture_state.texture_state', 'TextureState'),
+    15: ('converters.material_state.material_state', 'MaterialState'),
+}
+
+
+# All types convert_resource_entry knows, the others are kept as they are.
+SUPPORTED_RESOURCE_TYPES = set(CONVERTER_CLASSES) | {
+    1, # Material
+    42, # Model
+}
+
+
+@functools.cache
+def get_converter_class(resource_type: int) -> type:
+    module_name, class_name = CONVERTER_CLASSES[resource_type]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+# Resources of the converted types which already hold the D3D11 layout, e.g. of a bundle
+# converted before, are kept as they are. Every converter reads its own output back.
+def is_converted_resource(resource_entry: bnd2.ResourceEntry) -> bool:
+    return resource_entry.type in CONVERTER_CLASSES and get_converter_class(resource_entry.type)(resource_entry).is_converted()
+
+
+# The detection imports the converters of the given types first, so its timing doesn't include their imports.
+def import_converter_classes(resource_types: Iterable[int]) -> None:
+    for resource_type in set(resource_types) & CONVERTER_CLASSES.keys():
+        get_converter_class(resource_type)
+
+
+def get_converted_resource_ids(resource_entries: list[bnd2.ResourceEntry], metrics: Metrics) -> set[int]:
+    import_converter_classes(resource_entry.type for resource_entry in resource_entries)
+    converted_ids = set()
+    with metrics.measure('detect_converted'):
+        for resource_entry in resource_entries:
+            if is_converted_resource(resource_entry):
+                metrics.count('already_converted', resource_entry.type)
+                converted_ids.add(resource_entry.id)
+    return converted_ids
+
+
+# A bundle is converted when it has resources of the converted types and all of them are.
+# Only the first data blocks are read and the scan stops at the first D3D9 resource.
+def is_converted_bundle_file(file_name: str, metrics: Metrics) -> bool:
+    with BundleView(file_name) as bundle_view:
+        entry_indices = [entry_index for entry_index in range(len(bundle_view.resource_ids)) if bundle_view.get_resource_type_at(entry_index) in CONVERTER_CLASSES]
+        import_converter_classes(bundle_view.get_resource_type_at(entry_index) for entry_index in entry_indices)
+        with metrics.measure('detect_converted'):
+            return len(entry_indices) > 0 and all(is_converted_resource(bundle_view.get_resource_entry_at(entry_index, header_only=True)) for entry_index in entry_indices)
+
+
+# Bundles with more resources than this are converted in parallel, when enabled.
+RESOURCES_PER_CHUNK = 64
+
+
+# Optional changes to the output, all of them off by default.
+@dataclass
+class ConversionOptions:
+    repack_vertex_buffers: bool = False
+    narrow_index_buffers: bool = False
+    max_texture_size: int | None = None
+    deduplicate_resources: bool = False
+
+
+def run_converter(converter_class: type, resource_entry: bnd2.ResourceEntry, metrics: Metrics) -> None:
+    converter = converter_class(resource_entry)
+    # The converter's own load and store steps are timed apart from the rest of its conversion.
+    converter._load = metrics.timed('converter_load', resource_entry.type, converter._load)
+    converter._store = metrics.timed('converter_store', resource_entry.type, converter._store)
+    converter.convert()
+
+
+# Kept for the whole process, so a worker reuses it for every bundle it converts.
+_conversion_memo = ConversionMemo(CONVERSION_MEMO_SIZE)
+
+
+def clear_conversion_memo() -> None:
+    _conversion_memo.clear()
+
+
+def restore_converted_resource(resource_entry: bnd2.ResourceEntry, converted_resource: tuple[bytes, list[int]]) -> None:
+    resource_entry.data[0], import_offsets = converted_resource
+    for import_entry, import_offset in zip(resource_entry.import_entries, import_offsets):
+        import_entry.offset = import_offset
+
+
+def convert_resource(converter_class: type, resource_entry: bnd2.ResourceEntry, conversion_cache: ConversionCache | None, metrics: Metrics | None = None) -> None:
+    metrics = metrics if metrics is not None else Metrics()
+    with metrics.measure('convert', resource_entry.type, resource_entry):
+        memo_key = None
+        if _conversion_memo.is_memoized(resource_entry):
+            memo_key = _conversion_memo.get_key(resource_entry)
+            memoized_resource = _conversion_memo.load(memo_key)
+            metrics.count('memo_misses' if memoized_resource is None else 'memo_hits', resource_entry.type)
+            if memoized_resource is not None:
+                restore_converted_resource(resource_entry, memoized_resource)
+                return
+
+        if conversion_cache is None or not conversion_cache.is_cacheable(resource_entry):
+            run_converter(converter_class, resource_entry, metrics)
+        else:
+            key = conversion_cache.get_key(resource_entry)
+            cached_resource = conversion_cache.load(key)
+            if cached_resource is not None:
+                restore_converted_resource(resource_entry, cached_resource)
+            else:
+                run_converter(converter_class, resource_entry, metrics)
+                conversion_cache.store(key, resource_entry.data[0], [import_entry.offset for import_entry in resource_entry.import_entries])
+
+        if memo_key is not None:
+            _conversion_memo.store(memo_key, resource_entry.data[0], [import_entry.offset for import_entry in resource_entry.import_entries])
+
+
+def remap_resource_ids(bundle: bnd2.BundleV2, new_ids: Mapping[int, int]) -> None:
+    # Changes the IDs of all resources and their imports in a single pass,
+    # where changing them one by one would walk the whole bundle for every ID.
+    for resource_entry in bundle.resource_entries:
+        resource_entry.id = new_ids.get(resource_entry.id, resource_entry.id)
+        for import_entry in resource_entry.import_entries:
+            import_entry.id = new_ids.get(import_entry.id, import_entry.id)
+
+
+def convert_resource_entry(resource_entry: bnd2.ResourceEntry, new_id: int, conversion_cache: ConversionCache | None = None, metrics: Metrics | None = None) -> None:
+    metrics = metrics if metrics is not None else Metrics()
+    if resource_entry.type in CONVERTER_CLASSES:
+        convert_resource(get_converter_class(resource_entry.type), resource_entry, conversion_cache, metrics)
+
+    # Material
+    elif resource_entry.type == 1:
+        with metrics.measure('convert', resource_entry.type, resource_entry):
+            data = bytearray(resource_entry.data[0])
+            struct.pack_into('<L', data, 0x4, new_id)
+            resource_entry.data[0] = data
+
+    # Model and any other type keep their data and only get a new ID.
+
+
+def convert_bundle(bundle: bnd2.BundleV2, external_resources: Mapping[int, tuple[BundleView, bnd2.ResourceEntry]], id_allocator: IdAllocator, conversion_cache: ConversionCache | None = None, bundle_name: str = None, metrics: Metrics | None = None, conversion_options: ConversionOptions | None = None, workers_count: int = 1) -> dict[int, str | None]:
+    metrics = metrics if metrics is not None else Metrics()
+    conversion_options = conversion_options if conversion_options is not None else ConversionOptions()
+    # Maps the external resource IDs to the file names of the bundles which supplied them.
+    supplying_file_names: dict[int, str | None] = {}
+
+    # The original IDs of the resources which are already converted or are converted
+    # ahead of the loop giving the new IDs.
+    converted_ids = get_converted_resource_ids(bundle.resource_entries, metrics)
+    if len(converted_ids) > 0 and all(resource_entry.id in converted_ids for resource_entry in bundle.resource_entries if resource_entry.type in CONVERTER_CLASSES):
+        print("The bundle is already converted, it's kept as it is.")
+        return supplying_file_names
+
+    external_resource_entries = []
+    external_resource_ids = bundle.get_external_resource_ids()
+    for external_resource_id in external_resource_ids:
+        start = time.perf_counter()
+        external_resource = external_resources.get(external_resource_id)
+        if external_resource is not None:
+            # Every lookup materializes a new resource entry, so it's converted without copying.
+            external_bundle, external_resource_entry = external_resource
+            metrics.add('external_lookup', external_resource_entry.type, time.perf_counter() - start, bytes_out=get_resource_size(external_resource_entry))
+            bundle.resource_entries.append(external_resource_entry)
+            external_resource_entries.append(external_resource_entry)
+            supplying_file_names[external_resource_id] = external_bundle.file_name
+        else:
+            metrics.add('external_lookup', None, time.perf_counter() - start)
+            print(f"Cannot find external resource entry with ID {external_resource_id :08X}.")
+            supplying_file_names[external_resource_id] = None
+
+    converted_ids.update(get_converted_resource_ids(external_resource_entries, metrics))
+    if len(converted_ids) > 0:
+        print(f"Keeping {len(converted_ids)} already converted resource(s) as they are.")
+
+    # The passes read the D3D9 layouts, so they only get the resources still to convert.
+    d3d9_resource_entries = [resource_entry for resource_entry in bundle.resource_entries if resource_entry.id not in converted_ids]
+
+    # The optional passes are imported only when they are enabled, see CONVERTER_CLASSES.
+    if conversion_options.repack_vertex_buffers:
+        from vertex_buffers import repack_vertex_buffers
+        with metrics.measure('repack_vertex_buffers'):
+            repacked_count = repack_vertex_buffers(d3d9_resource_entries)
+        if repacked_count > 0:
+            print(f"Repacked {repacked_count} vertex descriptor(s) and their vertex buffers.")
+
+    if conversion_options.narrow_index_buffers:
+        from index_buffers import narrow_index_buffers
+        with metrics.measure('narrow_index_buffers'):
+            narrowed_count = narrow_index_buffers(d3d9_resource_entries)
+        if narrowed_count > 0:
+            print(f"Narrowed {narrowed_count} index buffer(s) to 16-bit.")
+
+    if conversion_options.max_texture_size is not None:
+        from texture_mipmaps import cap_texture_sizes
+        with metrics.measure('cap_texture_sizes'):
+            capped_count = cap_texture_sizes(d3d9_resource_entries, conversion_options.max_texture_size)
+        if capped_count > 0:
+            print(f"Dropped the mip levels above {conversion_options.max_texture_size} of {capped_count} texture(s).")
+
+    # A new ID must not match an ID which is still to be renamed or can't be resolved.
+    id_allocator.reserve(resource_entry.id for resource_entry in bundle.resource_entries)
+    id_allocator.reserve(external_resource_ids)
+
+    # The bundle name seeds the new IDs, so it has to be unique among the converted bundles.
+    bundle_name = bundle_name or os.path.basename(bundle.file_name)
+
+    # Only the conversions run in parallel, which doesn't depend on the new IDs
+    # (but for Materials, which stay in the loop).
+    if workers_count > 1 and len(bundle.resource_entries) > RESOURCES_PER_CHUNK:
+        from parallel_conversion import convert_resource_entries_in_parallel
+        parallel_resource_entries = [resource_entry for resource_entry in d3d9_resource_entries if resource_entry.type in CONVERTER_CLASSES]
+        convert_resource_entries_in_parallel(parallel_resource_entries, workers_count, conversion_cache, metrics)
+        converted_ids.update(resource_entry.id for resource_entry in parallel_resource_entries)
+
+    # Identical resources get an ID derived from their converted content instead,
+    # which is the same in every bundle. So they are converted before the others.
+    content_hashes: dict[int, str] = {}
+    if conversion_options.deduplicate_resources:
+        for resource_entry in bundle.resource_entries:
+            if resource_entry.type in DEDUPLICATED_RESOURCE_TYPES and resource_entry.id not in converted_ids:
+                convert_resource_entry(resource_entry, resource_entry.id, conversion_cache, metrics)
+                converted_ids.add(resource_entry.id)
+        with metrics.measure('hash_contents'):
+            content_hashes = get_content_hashes(bundle.resource_entries)
+
+    # Only the supported types get new IDs, the others keep theirs, as do the imports of them.
+    new_ids: dict[int, int] = {}
+    for resource_entry in bundle.resource_entries:
+        if resource_entry.type not in SUPPORTED_RESOURCE_TYPES:
+            continue
+        content_hash = content_hashes.get(resource_entry.id)
+        if content_hash is not None:
+            new_id = id_allocator.allocate_shared(content_hash)
+        else:
+            new_id = id_allocator.allocate(bundle_name, resource_entry.id)
+            if resource_entry.id not in converted_ids:
+                convert_resource_entry(resource_entry, new_id, conversion_cache, metrics)
+        new_ids[resource_entry.id] = new_id
+
+    with metrics.measure('remap_resource_ids'):
+        remap_resource_ids(bundle, new_ids)
+
+    if conversion_options.deduplicate_resources:
+        removed_count = remove_duplicate_resource_entries(bundle)
+        if removed_count > 0:
+            print(f"Removed {removed_count} duplicate resource(s).")
+
+    return supplying_file_names
+
+
+def load_bundle(file_name: str) -> bnd2.BundleV2:
+    bundle = bnd2.BundleV2(file_name)
+    bundle.load()
+    return bundle
+
+
+def load_external_resources(external_file_names: list[str]) -> ExternalResources:
+    return ExternalResources(locate_external_resources(external_file_names))
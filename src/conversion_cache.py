@@ -0,0 +1,116 @@
+import os
+import struct
+import hashlib
+
+import bnd2
+
+
+# Types whose conversion also depends on the resource ID and not only on the data.
+RESOURCE_TYPES_KEYED_BY_ID = {
+    15, # Material State
+}
+
+
+# Types whose conversion rewrites more than data[0]. Their conversion is cheaper
+# than hashing and storing all their data would be, so they are never cached.
+UNCACHED_RESOURCE_TYPES = {
+    0, # Texture
+}
+
+
+# On-disk cache of converted resources, addressed by a hash of everything the
+# converters read: the resource type, data[0] and the import entry layout.
+# Every entry is a separate file written through a temporary file and
+# os.replace(), so concurrent writers never expose a partially written entry.
+# The modification time of an entry is refreshed on every hit and the least
+# recently used entries are removed once the cache grows over its maximum size.
+class ConversionCache:
+
+    def __init__(self, directory: str, max_size: int, version: int):
+        self.directory = directory
+        self.max_size = max_size
+        self.version = version
+
+
+    def is_cacheable(self, resource_entry: bnd2.ResourceEntry) -> bool:
+        return resource_entry.type not in UNCACHED_RESOURCE_TYPES
+
+
+    def get_key(self, resource_entry: bnd2.ResourceEntry) -> str:
+        key = hashlib.blake2b(digest_size=20)
+        key.update(struct.pack('<LL', self.version, resource_entry.type))
+        if resource_entry.type in RESOURCE_TYPES_KEYED_BY_ID:
+            key.update(struct.pack('<Q', resource_entry.id))
+        key.update(struct.pack('<L', len(resource_entry.import_entries)))
+        for import_entry in resource_entry.import_entries:
+            key.update(struct.pack('<L', import_entry.offset))
+        key.update(resource_entry.data[0])
+        return key.hexdigest()
+
+
+    def load(self, key: str) -> tuple[bytes, list[int]] | None:
+        file_name = self._get_file_name(key)
+        try:
+            with open(file_name, 'rb') as fp:
+                entry = fp.read()
+            os.utime(file_name)
+        except OSError:
+            return None
+
+        if len(entry) < 8:
+            return None
+        data_size, import_offsets_count = struct.unpack_from('<LL', entry, 0)
+        if len(entry) != 8 + 4 * import_offsets_count + data_size:
+            return None
+        import_offsets = list(struct.unpack_from(f'<{import_offsets_count}L', entry, 8))
+        data = entry[8 + 4 * import_offsets_count:]
+        return data, import_offsets
+
+
+    def store(self, key: str, data: bytes, import_offsets: list[int]) -> None:
+        file_name = self._get_file_name(key)
+        temporary_file_name = f'{file_name}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+            with open(temporary_file_name, 'wb') as fp:
+                fp.write(struct.pack('<LL', len(data), len(import_offsets)))
+                fp.write(struct.pack(f'<{len(import_offsets)}L', *import_offsets))
+                fp.write(data)
+            os.replace(temporary_file_name, file_name)
+        except OSError:
+            # The cache is only an optimization, a failed write must not fail the conversion.
+            try:
+                os.remove(temporary_file_name)
+            except OSError:
+                pass
+
+
+    def evict(self) -> int:
+        entries: list[tuple[int, int, str]] = []
+        total_size = 0
+        for directory_path, _, file_names in os.walk(self.directory):
+            for file_name in file_names:
+                file_path = os.path.join(directory_path, file_name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, file_path))
+                total_size += stat.st_size
+
+        evicted_count = 0
+        entries.sort()
+        for _, size, file_path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(file_path)
+            except OSError:
+                continue
+            total_size -= size
+            evicted_count += 1
+        return evicted_count
+
+
+    def _get_file_name(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
@@ -0,0 +1,51 @@
+from collections import OrderedDict
+
+import bnd2
+
+from conversion_cache import RESOURCE_TYPES_KEYED_BY_ID
+
+
+# Small resources with few distinct contents, worth remembering in memory.
+MEMOIZED_RESOURCE_TYPES = {
+    10, # Vertex Descriptor
+    14, # Texture State
+    15, # Material State
+}
+
+
+# In-process LRU memo of converted resources, addressed by the same inputs as the
+# conversion cache but without hashing them. It lives as long as the process, so a
+# worker reuses it across all bundles it converts.
+class ConversionMemo:
+
+    def __init__(self, max_entries_count: int):
+        self.max_entries_count = max_entries_count
+        self.entries: OrderedDict[tuple, tuple[bytes, list[int]]] = OrderedDict()
+
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+    def is_memoized(self, resource_entry: bnd2.ResourceEntry) -> bool:
+        return resource_entry.type in MEMOIZED_RESOURCE_TYPES and self.max_entries_count > 0
+
+
+    def get_key(self, resource_entry: bnd2.ResourceEntry) -> tuple:
+        resource_id = resource_entry.id if resource_entry.type in RESOURCE_TYPES_KEYED_BY_ID else None
+        import_offsets = tuple(import_entry.offset for import_entry in resource_entry.import_entries)
+        return resource_entry.type, resource_id, import_offsets, bytes(resource_entry.data[0])
+
+
+    def load(self, key: tuple) -> tuple[bytes, list[int]] | None:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+
+    def store(self, key: tuple, data: bytes, import_offsets: list[int]) -> None:
+        self.entries[key] = (bytes(data), list(import_offsets))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries_count:
+            self.entries.popitem(last=False)
@@ -0,0 +1,52 @@
+from typing import Any
+
+import numpy as np
+
+from .layout import Layout
+
+
+# Reads records straight out of the resource data through a memoryview,
+# so nothing is copied before the values are unpacked.
+class BufferReader:
+
+    def __init__(self, data: bytes | bytearray | memoryview):
+        self.view = memoryview(data)
+
+
+    def read(self, layout: Layout, offset: int, target: Any = None) -> dict[str, Any]:
+        return layout.unpack_from(self.view, offset, target)
+
+
+    def read_numpy(self, dtype: np.dtype | str, count: int = -1, offset: int = 0) -> np.ndarray:
+        return np.frombuffer(self.view, dtype=dtype, count=count, offset=offset)
+
+
+    def read_records(self, dtype: np.dtype, offsets: np.ndarray) -> np.ndarray:
+        # Gathers the records at the offsets into one structured array with one read.
+        buffer = np.frombuffer(self.view, dtype=np.uint8)
+        return buffer[offsets[:, np.newaxis] + np.arange(dtype.itemsize)].view(dtype).reshape(len(offsets))
+
+
+# Builds the output of a converter in place in a buffer preallocated to its final size.
+# The buffer becomes the new resource data as it is, without a final copy.
+class BufferWriter:
+
+    def __init__(self, size: int):
+        self.buffer = bytearray(size)
+
+
+    def write(self, layout: Layout, offset: int, source: Any = None, **values: Any) -> None:
+        layout.pack_into(self.buffer, offset, source, **values)
+
+
+    def write_numpy(self, offset: int, array: np.ndarray) -> None:
+        array = np.ascontiguousarray(array).view(np.uint8).reshape(-1)
+        with memoryview(self.buffer) as view:
+            view[offset:offset + array.nbytes] = array
+
+
+    def write_records(self, offsets: np.ndarray, records: np.ndarray) -> None:
+        # Scatters the records of a structured array to their offsets with one write.
+        record_size = records.dtype.itemsize
+        buffer = np.frombuffer(self.buffer, dtype=np.uint8)
+        buffer[offsets[:, np.newaxis] + np.arange(record_size)] = np.ascontiguousarray(records).view(np.uint8).reshape(len(records), record_size)
@@ -0,0 +1,168 @@
+import struct
+from dataclasses import dataclass, fields
+from enum import Enum
+from typing import Any
+
+
+@dataclass
+class Bits:
+    shift: int = None
+    width: int = None
+    name: str = None
+    type: type = None
+    value: int = 0
+
+
+@dataclass
+class Field:
+    format: str = None
+    name: str = None
+    type: type = None
+    value: Any = None
+    bits: tuple[Bits, ...] = None
+
+
+def _convert_to_raw(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+# Describes a record as a sequence of fields and compiles it to a single
+# struct.Struct, so a whole record is read or written with one call.
+#
+# A field with a name is read into / written from the attribute of that name.
+# A field with bits is an integer made of bit fields, each of them named or constant.
+# Any other field is skipped when reading and written as its value (zero by default).
+class Layout:
+
+    def __init__(self, *layout_fields: Field):
+        self.fields = layout_fields
+
+        unpack_format = '<'
+        pack_format = '<'
+        self._readers: list[tuple] = []
+        self._writers: list[tuple] = []
+        # (offset, struct, values) of the fields with an explicit constant value.
+        self._constants: list[tuple[int, struct.Struct, tuple]] = []
+        # (offset, struct) of the named fields holding a single value.
+        self._named_fields: dict[str, tuple[int, struct.Struct]] = {}
+        value_index = 0
+        field_offset = 0
+        for field in layout_fields:
+            field_struct = struct.Struct('<' + field.format)
+            values_count = len(field_struct.unpack(bytes(field_struct.size)))
+            pack_format += field.format
+
+            if field.bits is not None:
+                unpack_format += field.format
+                self._readers.append(('bits', value_index, tuple((bits.name, bits.shift, 2 ** bits.width - 1, bits.type) for bits in field.bits if bits.name is not None)))
+                self._writers.append(('bits', tuple((bits.name, bits.shift, 2 ** bits.width - 1, bits.value) for bits in field.bits)))
+                value_index += values_count
+            elif field.name is not None:
+                unpack_format += field.format
+                self._readers.append(('value', value_index, values_count, field.name, field.type))
+                self._writers.append(('value', values_count, field.name, '?' not in field.format))
+                value_index += values_count
+                if values_count == 1:
+                    self._named_fields[field.name] = (field_offset, field_struct)
+            else:
+                unpack_format += f'{field_struct.size}x'
+                if values_count > 0:
+                    if field.value is None:
+                        constant = field_struct.unpack(bytes(field_struct.size))
+                    elif values_count == 1:
+                        constant = (field.value,)
+                    else:
+                        constant = tuple(field.value)
+                    self._writers.append(('constant', constant))
+                    if field.value is not None:
+                        self._constants.append((field_offset, field_struct, constant))
+            field_offset += field_struct.size
+
+        self._unpack_struct = struct.Struct(unpack_format)
+        self._pack_struct = struct.Struct(pack_format)
+        self.size = self._pack_struct.size
+        self._target_names: dict[type, frozenset[str]] = {}
+
+
+    def unpack_from(self, buffer, offset: int = 0, target: Any = None) -> dict[str, Any]:
+        # Returns the named values. The ones matching a field of the target dataclass are also set on it.
+        raw_values = self._unpack_struct.unpack_from(buffer, offset)
+        values: dict[str, Any] = {}
+        for reader in self._readers:
+            if reader[0] == 'value':
+                _, value_index, values_count, name, value_type = reader
+                value = raw_values[value_index] if values_count == 1 else raw_values[value_index:value_index + values_count]
+                values[name] = value if value_type is None else value_type(value)
+            else:
+                _, value_index, bits = reader
+                dword = raw_values[value_index]
+                for name, shift, mask, value_type in bits:
+                    value = (dword >> shift) & mask
+                    values[name] = value if value_type is None else value_type(value)
+
+        if target is not None:
+            target_names = self._get_target_names(type(target))
+            for name, value in values.items():
+                if name in target_names:
+                    setattr(target, name, value)
+        return values
+
+
+    def matches(self, buffer, offset: int = 0) -> bool:
+        # Whether the record fits into the buffer and holds the explicit constants of the layout.
+        if offset < 0 or offset + self.size > len(buffer):
+            return False
+        return all(field_struct.unpack_from(buffer, offset + field_offset) == constant for field_offset, field_struct, constant in self._constants)
+
+
+    def pack_into(self, buffer, offset: int, source: Any = None, **values: Any) -> None:
+        self._pack_struct.pack_into(buffer, offset, *self._collect(source, values))
+
+
+    def pack_fields_into(self, buffer, offset: int, /, **values: Any) -> None:
+        # Writes only the given named fields, all other bytes of the record are kept.
+        for name, value in values.items():
+            field_offset, field_struct = self._named_fields[name]
+            field_struct.pack_into(buffer, offset + field_offset, _convert_to_raw(value))
+
+
+    def pack(self, source: Any = None, **values: Any) -> bytes:
+        return self._pack_struct.pack(*self._collect(source, values))
+
+
+    def _collect(self, source: Any, values: dict[str, Any]) -> list[Any]:
+        # The keyword values take precedence over the attributes of the source.
+        raw_values: list[Any] = []
+        for writer in self._writers:
+            if writer[0] == 'value':
+                _, values_count, name, convert = writer
+                value = values[name] if name in values else getattr(source, name)
+                if convert:
+                    value = _convert_to_raw(value)
+                if values_count == 1:
+                    raw_values.append(value)
+                else:
+                    raw_values.extend(value)
+            elif writer[0] == 'bits':
+                _, bits = writer
+                dword = 0x00000000
+                for name, shift, mask, constant in bits:
+                    value = constant if name is None else _convert_to_raw(values[name] if name in values else getattr(source, name))
+                    dword |= (value & mask) << shift
+                raw_values.append(dword)
+            else:
+                _, constant = writer
+                raw_values.extend(constant)
+        return raw_values
+
+
+    def _get_target_names(self, target_type: type) -> frozenset[str]:
+        target_names = self._target_names.get(target_type)
+        if target_names is None:
+            target_names = frozenset(field.name for field in fields(target_type))
+            self._target_names[target_type] = target_names
+        return target_names
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from enum import Enum
 
+from ..layout import Bits, Field, Layout
+
 
 class Blend(Enum):
     ZERO = 1
@@ -50,3 +52,70 @@ class MaterialState:
         self.blend_state = BlendState()
         self.depth_stencil_state = DepthStencilState()
         self.rasterizer_state = RasterizerState()
+
+
+MATERIAL_STATE_LAYOUT = Layout(
+    Field('L', 'blend_state_offset'),
+    Field('L', 'depth_stencil_state_offset'),
+    Field('L', 'rasterizer_state_offset'),
+)
+
+
+BLEND_STATE_LAYOUT = Layout(
+    Field('L', bits=(
+        Bits(0, 1, 'blend_enable', bool),
+        Bits(1, 5, 'source_blend', Blend),
+        Bits(6, 5, 'destination_blend', Blend),
+        Bits(11, 3, value=1),
+        Bits(14, 5, value=5),
+        Bits(19, 5, value=6),
+        Bits(24, 3, value=1),
+        Bits(27, 4, value=0xF),
+    )),
+    Field('7L', value=(0x7931498A,) * 7),
+    Field('4f', value=(1.0, 1.0, 1.0, 1.0)),
+    Field('?', 'alpha_to_coverage_enable'),
+    Field('?', value=False),
+    Field('2x'), # padding
+    Field('L', value=1),
+    Field('L'),
+)
+
+
+DEPTH_STENCIL_STATE_LAYOUT = Layout(
+    Field('l', value=4),
+    Field('l', value=1),
+    Field('l', value=1),
+    Field('l', value=1),
+    Field('l', value=8),
+    Field('l', value=1),
+    Field('l', value=1),
+    Field('l', value=1),
+    Field('l', value=8),
+    Field('L'),
+    Field('L', value=0xFFFFFFFF),
+    Field('L', value=0xFFFFFFFF),
+    Field('?', value=True),
+    Field('?', 'depth_write_enable'),
+    Field('?', value=False),
+    Field('x'), # padding
+    Field('L', value=1),
+    Field('L'),
+    Field('L'),
+)
+
+
+RASTERIZER_STATE_LAYOUT = Layout(
+    Field('l', value=3),
+    Field('l', 'cull_mode', CullMode),
+    Field('l', value=1),
+    Field('l'),
+    Field('f', value=0.0),
+    Field('f', value=0.0),
+    Field('?', value=True), # uninitialized
+    Field('?', value=True),
+    Field('?', value=True),
+    Field('?', value=False),
+    Field('L', value=1),
+    Field('L'),
+)
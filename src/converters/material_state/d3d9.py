@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from enum import Enum
 
+from ..layout import Bits, Field, Layout
+
 
 class Blend(Enum):
     ZERO = 1
@@ -50,3 +52,60 @@ class MaterialState:
         self.blend_state = BlendState()
         self.depth_stencil_state = DepthStencilState()
         self.rasterizer_state = RasterizerState()
+
+
+MATERIAL_STATE_LAYOUT = Layout(
+    Field('L', 'blend_state_offset'),
+    Field('L', 'depth_stencil_state_offset'),
+    Field('L', 'rasterizer_state_offset'),
+)
+
+
+BLEND_STATE_LAYOUT = Layout(
+    Field('L', bits=(
+        Bits(0, 5, 'source_blend', Blend),
+        Bits(8, 8, 'destination_blend', Blend),
+    )),
+    Field('4L'),
+    Field('4L'),
+    Field('L', 'alpha_blend_enable', bool),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L', 'alpha_to_coverage_enable', bool),
+)
+
+
+DEPTH_STENCIL_STATE_LAYOUT = Layout(
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L', 'z_write_enable', bool),
+    Field('L'),
+    Field('L'),
+)
+
+
+RASTERIZER_STATE_LAYOUT = Layout(
+    Field('L'),
+    Field('l', 'cull_mode', CullMode),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+)
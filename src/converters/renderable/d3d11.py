@@ -1,6 +1,10 @@
 from dataclasses import dataclass
 from enum import Enum
 
+import numpy as np
+
+from ..layout import Field, Layout
+
 
 class BufferType(Enum):
     VERTEX_BUFFER = 2
@@ -25,15 +29,6 @@ class VertexBuffer(Buffer):
     pass
 
 
-@dataclass
-class Mesh:
-    transformation: tuple[float] = None
-    start_index_location: int = None
-    indices_count: int = None
-    vertex_descriptors_count: int = None
-    flags: int = None
-
-
 @dataclass
 class Renderable:
     bounding_sphere: tuple[float] = None
@@ -41,8 +36,51 @@ class Renderable:
     flags: int = None
     index_buffer: IndexBuffer = None
     vertex_buffer: VertexBuffer = None
-    meshes: list[Mesh] = None
+    meshes: np.ndarray = None
 
     def __post_init__(self):
         self.index_buffer = IndexBuffer()
         self.vertex_buffer = VertexBuffer()
+
+
+RENDERABLE_LAYOUT = Layout(
+    Field('4f', 'bounding_sphere'),
+    Field('H', value=11),
+    Field('H', 'meshes_count'),
+    Field('L', 'meshes_offset'),
+    Field('L'),
+    Field('H', 'flags'),
+    Field('2x'), # padding
+    Field('L', 'index_buffer_offset'),
+    Field('L', 'vertex_buffer_offset'),
+)
+
+
+INDEX_BUFFER_LAYOUT = Layout(
+    Field('L'),
+    Field('l'),
+    Field('l', 'type', BufferType),
+    Field('L', 'data_offset'),
+    Field('L', 'data_size'),
+    Field('L', 'index_size'),
+)
+
+
+VERTEX_BUFFER_LAYOUT = Layout(
+    Field('L'),
+    Field('l'),
+    Field('l', 'type', BufferType),
+    Field('L', 'data_offset'),
+    Field('L', 'data_size'),
+    Field('L'),
+    Field('L'),
+)
+
+
+# Followed by one vertex descriptor import per vertex descriptor.
+MESH_DTYPE = np.dtype({
+    'names': ['transformation', 'unknown_0x40', 'start_index_location', 'indices_count', 'material_import', 'vertex_descriptors_count', 'unknown_0x56', 'flags', 'index_buffer_offset', 'vertex_buffer_offset'],
+    'formats': [('<f4', (16,)), '<i4', '<u4', '<u4', '<u4', 'u1', 'u1', 'u1', '<u4', '<u4'],
+    'offsets': [0x0, 0x40, 0x48, 0x4C, 0x50, 0x54, 0x56, 0x57, 0x58, 0x5C],
+    'itemsize': 0x60,
+})
@@ -1,6 +1,10 @@
 from dataclasses import dataclass
 from enum import Enum
 
+import numpy as np
+
+from ..layout import Field, Layout
+
 
 class IndexFormat(Enum):
     INDEX_16 = 101
@@ -20,15 +24,6 @@ class VertexBuffer:
     data_size: int = None
 
 
-@dataclass
-class Mesh:
-    transformation: tuple[float] = None
-    start_index: int = None
-    primitives_count: int = None
-    vertex_descriptors_count: int = None
-    flags: int = None
-
-
 @dataclass
 class Renderable:
     bounding_sphere: tuple[float] = None
@@ -36,8 +31,45 @@ class Renderable:
     flags: int = None
     index_buffer: IndexBuffer = None
     vertex_buffer: VertexBuffer = None
-    meshes: list[Mesh] = None
+    meshes: np.ndarray = None
 
     def __post_init__(self):
         self.index_buffer = IndexBuffer()
         self.vertex_buffer = VertexBuffer()
+
+
+RENDERABLE_LAYOUT = Layout(
+    Field('4f', 'bounding_sphere'),
+    Field('H'),
+    Field('H', 'meshes_count'),
+    Field('L', 'meshes_offset'),
+    Field('L'),
+    Field('H', 'flags'),
+    Field('2x'), # padding
+    Field('L', 'index_buffer_offset'),
+    Field('L', 'vertex_buffer_offset'),
+)
+
+
+INDEX_BUFFER_LAYOUT = Layout(
+    Field('L', 'indices_count'),
+    Field('L', 'data_offset'),
+    Field('L'),
+    Field('l', 'format', IndexFormat),
+)
+
+
+VERTEX_BUFFER_LAYOUT = Layout(
+    Field('L', 'data_offset'),
+    Field('L'),
+    Field('L', 'data_size'),
+    Field('L'),
+)
+
+
+MESH_DTYPE = np.dtype({
+    'names': ['transformation', 'start_index', 'primitives_count', 'vertex_descriptors_count', 'flags'],
+    'formats': [('<f4', (16,)), '<u4', '<u4', 'u1', 'u1'],
+    'offsets': [0x0, 0x48, 0x54, 0x5C, 0x5F],
+    'itemsize': 0x60,
+})
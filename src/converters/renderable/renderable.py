@@ -1,8 +1,9 @@
-import io
 import struct
 
 import bnd2
+import numpy as np
 
+from ..buffer import BufferReader, BufferWriter
 from . import d3d9
 from . import d3d11
 
@@ -38,130 +39,98 @@ class Renderable:
         self.d3d11_renderable.vertex_buffer.data_offset = self.d3d9_renderable.vertex_buffer.data_offset
         self.d3d11_renderable.vertex_buffer.data_size = self.d3d9_renderable.vertex_buffer.data_size
 
-        self.d3d11_renderable.meshes = [d3d11.Mesh() for _ in range(self.d3d9_renderable.meshes_count)]
-        for i in range(self.d3d9_renderable.meshes_count):
-            self.d3d11_renderable.meshes[i].transformation = self.d3d9_renderable.meshes[i].transformation
-            self.d3d11_renderable.meshes[i].start_index_location = self.d3d9_renderable.meshes[i].start_index
-            self.d3d11_renderable.meshes[i].indices_count = 3 * self.d3d9_renderable.meshes[i].primitives_count
-            self.d3d11_renderable.meshes[i].vertex_descriptors_count = self.d3d9_renderable.meshes[i].vertex_descriptors_count
-            self.d3d11_renderable.meshes[i].flags = self.d3d9_renderable.meshes[i].flags
+        self.d3d11_renderable.meshes = np.zeros(self.d3d9_renderable.meshes_count, dtype=d3d11.MESH_DTYPE)
+        self.d3d11_renderable.meshes['transformation'] = self.d3d9_renderable.meshes['transformation']
+        self.d3d11_renderable.meshes['start_index_location'] = self.d3d9_renderable.meshes['start_index']
+        self.d3d11_renderable.meshes['indices_count'] = 3 * self.d3d9_renderable.meshes['primitives_count']
+        self.d3d11_renderable.meshes['vertex_descriptors_count'] = self.d3d9_renderable.meshes['vertex_descriptors_count']
+        self.d3d11_renderable.meshes['flags'] = self.d3d9_renderable.meshes['flags']
 
         self._store()
 
 
     def _load(self) -> None:
-        data = io.BytesIO(self.resource_entry.data[0])
-
-        data.seek(0x0)
-        self.d3d9_renderable.bounding_sphere = struct.unpack('<4f', data.read(4 * 4))
-        _ = data.read(2)
-        self.d3d9_renderable.meshes_count = struct.unpack('<H', data.read(2))[0]
-        meshes_offset = struct.unpack('<L', data.read(4))[0]
-        _ = data.read(4)
-        self.d3d9_renderable.flags = struct.unpack('<H', data.read(2))[0]
-        _ = data.read(2) # padding
-        index_buffer_offset = struct.unpack('<L', data.read(4))[0]
-        vertex_buffer_offset = struct.unpack('<L', data.read(4))[0]
-
-        data.seek(index_buffer_offset)
-        self.d3d9_renderable.index_buffer.indices_count = struct.unpack('<L', data.read(4))[0]
-        self.d3d9_renderable.index_buffer.data_offset = struct.unpack('<L', data.read(4))[0]
-        _ = data.read(4)
-        self.d3d9_renderable.index_buffer.format = d3d9.IndexFormat(struct.unpack('<l', data.read(4))[0])
-
-        data.seek(vertex_buffer_offset)
-        self.d3d9_renderable.vertex_buffer.data_offset = struct.unpack('<L', data.read(4))[0]
-        _ = data.read(4)
-        self.d3d9_renderable.vertex_buffer.data_size = struct.unpack('<L', data.read(4))[0]
-        _ = data.read(4)
-
-        self.d3d9_renderable.meshes = [d3d9.Mesh() for _ in range(self.d3d9_renderable.meshes_count)]
-        for i, mesh in enumerate(self.d3d9_renderable.meshes):
-            data.seek(meshes_offset + i * 0x4)
-            mesh_offset = struct.unpack('<L', data.read(4))[0]
-            data.seek(mesh_offset)
-            mesh.transformation = struct.unpack('<16f', data.read(16 * 4))
-            _ = data.read(4)
-            _ = data.read(4)
-            mesh.start_index = struct.unpack('<L', data.read(4))[0]
-            _ = data.read(4)
-            _ = data.read(4)
-            mesh.primitives_count = struct.unpack('<L', data.read(4))[0]
-            _ = data.read(4)
-            mesh.vertex_descriptors_count = struct.unpack('B', data.read(1))[0]
-            _ = data.read(1)
-            _ = data.read(1)
-            mesh.flags = struct.unpack('B', data.read(1))[0]
+        data = BufferReader(self.resource_entry.data[0])
+
+        header = data.read(d3d9.RENDERABLE_LAYOUT, 0x0, self.d3d9_renderable)
+        data.read(d3d9.INDEX_BUFFER_LAYOUT, header['index_buffer_offset'], self.d3d9_renderable.index_buffer)
+        data.read(d3d9.VERTEX_BUFFER_LAYOUT, header['vertex_buffer_offset'], self.d3d9_renderable.vertex_buffer)
+
+        # Gather all the meshes the pointer table points to into one structured array.
+        meshes_offsets = data.read_numpy('<u4', self.d3d9_renderable.meshes_count, header['meshes_offset'])
+        self.d3d9_renderable.meshes = data.read_records(d3d9.MESH_DTYPE, meshes_offsets)
+
+
+    def is_converted(self) -> bool:
+        # D3D11 renderables have 11 at 0x10 and typed index and vertex buffers.
+        if not d3d11.RENDERABLE_LAYOUT.matches(self.resource_entry.data[0], 0x0):
+            return False
+        try:
+            self._load_d3d11()
+        except (ValueError, IndexError, struct.error):
+            return False
+        return (
+            self.d3d11_renderable.index_buffer.type == d3d11.BufferType.INDEX_BUFFER and
+            self.d3d11_renderable.index_buffer.index_size in D3D3_INDEX_FORMAT_TO_D3D11_INDEX_SIZE.values() and
+            self.d3d11_renderable.vertex_buffer.type == d3d11.BufferType.VERTEX_BUFFER
+        )
+
+
+    def _load_d3d11(self) -> None:
+        data = BufferReader(self.resource_entry.data[0])
+
+        header = data.read(d3d11.RENDERABLE_LAYOUT, 0x0, self.d3d11_renderable)
+        data.read(d3d11.INDEX_BUFFER_LAYOUT, header['index_buffer_offset'], self.d3d11_renderable.index_buffer)
+        data.read(d3d11.VERTEX_BUFFER_LAYOUT, header['vertex_buffer_offset'], self.d3d11_renderable.vertex_buffer)
+
+        meshes_offsets = data.read_numpy('<u4', self.d3d11_renderable.meshes_count, header['meshes_offset'])
+        self.d3d11_renderable.meshes = data.read_records(d3d11.MESH_DTYPE, meshes_offsets)
 
 
     def _store(self) -> None:
-        data = io.BytesIO()
-
-        data.seek(0x0)
-        data.write(struct.pack('<4f', *self.d3d11_renderable.bounding_sphere))
-        data.write(struct.pack('<H', 11))
-        data.write(struct.pack('<H', self.d3d11_renderable.meshes_count))
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<H', self.d3d11_renderable.flags))
-        data.write(bytes(2)) # padding
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<L', 0))
-
-        meshes_offset = bnd2.util.align_offset(data.tell(), 0x10)
-        data.seek(meshes_offset)
-        for _ in range(self.d3d11_renderable.meshes_count):
-            data.write(struct.pack('<L', 0))
-
-        index_buffer_offset = data.tell()
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<l', 0))
-        data.write(struct.pack('<l', self.d3d11_renderable.index_buffer.type.value))
-        data.write(struct.pack('<L', self.d3d11_renderable.index_buffer.data_offset))
-        data.write(struct.pack('<L', self.d3d11_renderable.index_buffer.data_size))
-        data.write(struct.pack('<L', self.d3d11_renderable.index_buffer.index_size))
-
-        vertex_buffer_offset = data.tell()
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<l', 0))
-        data.write(struct.pack('<l', self.d3d11_renderable.vertex_buffer.type.value))
-        data.write(struct.pack('<L', self.d3d11_renderable.vertex_buffer.data_offset))
-        data.write(struct.pack('<L', self.d3d11_renderable.vertex_buffer.data_size))
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<L', 0))
-
-        meshes_offstes = []
-        import_index = 0
-        for i, mesh in enumerate(self.d3d11_renderable.meshes):
-            mesh_offset = bnd2.util.align_offset(data.tell(), 0x10)
-            meshes_offstes.append(mesh_offset)
-            data.seek(mesh_offset)
-            data.write(struct.pack('<16f', *mesh.transformation))
-            data.write(struct.pack('<l', 4))
-            data.write(struct.pack('<l', 0))
-            data.write(struct.pack('<L', mesh.start_index_location))
-            data.write(struct.pack('<L', mesh.indices_count))
-            self.resource_entry.import_entries[import_index].offset = data.tell()
-            import_index += 1
-            data.write(struct.pack('<L', 0))
-            data.write(struct.pack('B', mesh.vertex_descriptors_count))
-            data.write(struct.pack('B', 0))
-            data.write(struct.pack('B', 1))
-            data.write(struct.pack('B', mesh.flags))
-            data.write(struct.pack('<L', index_buffer_offset))
-            data.write(struct.pack('<L', vertex_buffer_offset))
-            for _ in range(mesh.vertex_descriptors_count):
-                self.resource_entry.import_entries[import_index].offset = data.tell()
-                import_index += 1
-                data.write(struct.pack('<L', 0))
-
-        data.seek(0x14)
-        data.write(struct.pack('<L', meshes_offset))
-        data.seek(0x20)
-        data.write(struct.pack('<L', index_buffer_offset))
-        data.write(struct.pack('<L', vertex_buffer_offset))
-        data.seek(meshes_offset)
-        for mesh_offset in meshes_offstes:
-            data.write(struct.pack('<L', mesh_offset))
-
-        self.resource_entry.data[0] = data.getvalue()
+        meshes_count = self.d3d11_renderable.meshes_count
+        meshes = self.d3d11_renderable.meshes
+
+        meshes_offset = bnd2.util.align_offset(d3d11.RENDERABLE_LAYOUT.size, 0x10)
+        index_buffer_offset = meshes_offset + 4 * meshes_count
+        vertex_buffer_offset = index_buffer_offset + d3d11.INDEX_BUFFER_LAYOUT.size
+
+        # Every mesh starts aligned to 0x10 and is followed by its vertex descriptor imports.
+        vertex_descriptors_counts = meshes['vertex_descriptors_count'].astype(np.int64)
+        meshes_sizes = d3d11.MESH_DTYPE.itemsize + 4 * vertex_descriptors_counts
+        meshes_strides = (meshes_sizes + 0xF) & ~0xF
+        first_mesh_offset = bnd2.util.align_offset(vertex_buffer_offset + d3d11.VERTEX_BUFFER_LAYOUT.size, 0x10)
+        meshes_offsets = first_mesh_offset + np.cumsum(meshes_strides, dtype=np.int64) - meshes_strides
+        if meshes_count > 0:
+            size = int(meshes_offsets[-1] + meshes_sizes[-1])
+        else:
+            size = vertex_buffer_offset + d3d11.VERTEX_BUFFER_LAYOUT.size
+
+        data = BufferWriter(size)
+        data.write(d3d11.RENDERABLE_LAYOUT, 0x0, self.d3d11_renderable, meshes_offset=meshes_offset, index_buffer_offset=index_buffer_offset, vertex_buffer_offset=vertex_buffer_offset)
+        data.write(d3d11.INDEX_BUFFER_LAYOUT, index_buffer_offset, self.d3d11_renderable.index_buffer)
+        data.write(d3d11.VERTEX_BUFFER_LAYOUT, vertex_buffer_offset, self.d3d11_renderable.vertex_buffer)
+
+        meshes['unknown_0x40'] = 4
+        meshes['material_import'] = 0
+        meshes['unknown_0x56'] = 1
+        meshes['index_buffer_offset'] = index_buffer_offset
+        meshes['vertex_buffer_offset'] = vertex_buffer_offset
+        data.write_numpy(meshes_offset, meshes_offsets.astype('<u4'))
+        data.write_records(meshes_offsets, meshes)
+
+        # Each mesh imports its material first and then its vertex descriptors.
+        imports_count = meshes_count + int(vertex_descriptors_counts.sum())
+        assert len(self.resource_entry.import_entries) >= imports_count, f"Resource entry with ID {self.resource_entry.id :08X} has too few import entries."
+        vertex_descriptors_first_imports = np.cumsum(vertex_descriptors_counts, dtype=np.int64) - vertex_descriptors_counts
+        material_imports = np.arange(meshes_count) + vertex_descriptors_first_imports
+        vertex_descriptor_imports = np.ones(imports_count, dtype=bool)
+        vertex_descriptor_imports[material_imports] = False
+        vertex_descriptors_indices = np.arange(imports_count - meshes_count) - np.repeat(vertex_descriptors_first_imports, vertex_descriptors_counts)
+        imports_offsets = np.empty(imports_count, dtype=np.int64)
+        imports_offsets[material_imports] = meshes_offsets + d3d11.MESH_DTYPE.fields['material_import'][1]
+        imports_offsets[vertex_descriptor_imports] = np.repeat(meshes_offsets + d3d11.MESH_DTYPE.itemsize, vertex_descriptors_counts) + 4 * vertex_descriptors_indices
+        for import_entry, import_offset in zip(self.resource_entry.import_entries, imports_offsets.tolist()):
+            import_entry.offset = import_offset
+
+        self.resource_entry.data[0] = data.buffer
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from enum import Enum
 
+from ..layout import Field, Layout
+
 
 class TextureType(Enum):
     TEXTURE_1D = 6
@@ -25,3 +27,27 @@ class Texture:
     depth: int = None
     count: int = None
     mipmap_levels_count: int = None
+
+
+TEXTURE_LAYOUT = Layout(
+    Field('L'),
+    Field('l'),
+    Field('l', 'type', TextureType),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('l', 'format', TextureFormat),
+    Field('L'),
+    Field('H', 'width'),
+    Field('H', 'height'),
+    Field('H', 'depth'),
+    Field('H', 'count'),
+    Field('B'),
+    Field('B', 'mipmap_levels_count'),
+    Field('2x'), # padding
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('L'),
+)
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from enum import Enum
 
+from ..layout import Field, Layout
+
 
 class TextureType(Enum):
     TEXTURE = 0
@@ -23,3 +25,20 @@ class Texture:
     depth: int = None
     mipmap_levels_count: int = None
     type: TextureType = None
+
+
+TEXTURE_LAYOUT = Layout(
+    Field('L'),
+    Field('L'),
+    Field('L'),
+    Field('H'),
+    Field('B'),
+    Field('B'),
+    Field('l', 'format', TextureFormat),
+    Field('H', 'width'),
+    Field('H', 'height'),
+    Field('B', 'depth'),
+    Field('B', 'mipmap_levels_count'),
+    Field('b', 'type', TextureType),
+    Field('B'),
+)
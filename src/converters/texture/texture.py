@@ -1,8 +1,9 @@
-import io
 import struct
 
 import bnd2
+import numpy as np
 
+from ..buffer import BufferReader, BufferWriter
 from . import d3d9
 from . import d3d11
 
@@ -22,6 +23,27 @@ D3D9_TEXTURE_FORMAT_TO_D3D11_TEXTURE_FORMAT = {
 }
 
 
+# Bytes per 4x4 block of the block compressed formats.
+D3D9_TEXTURE_FORMAT_BLOCK_SIZE = {
+    d3d9.TextureFormat.DXT1: 8,
+    d3d9.TextureFormat.DXT5: 16,
+}
+
+
+D3D9_TEXTURE_FORMAT_PIXEL_SIZE = {
+    d3d9.TextureFormat.A8R8G8B8: 4,
+}
+
+
+def get_mipmap_level_size(format: d3d9.TextureFormat, width: int, height: int, depth: int, level: int) -> int:
+    width = max(width >> level, 1)
+    height = max(height >> level, 1)
+    depth = max(depth >> level, 1)
+    if format in D3D9_TEXTURE_FORMAT_BLOCK_SIZE:
+        return ((width + 3) // 4) * ((height + 3) // 4) * depth * D3D9_TEXTURE_FORMAT_BLOCK_SIZE[format]
+    return width * height * depth * D3D9_TEXTURE_FORMAT_PIXEL_SIZE[format]
+
+
 class Texture:
 
     def __init__(self, resource_entry: bnd2.ResourceEntry):
@@ -44,49 +66,53 @@ class Texture:
 
         self._store()
 
+        if self.d3d9_texture.format == d3d9.TextureFormat.A8R8G8B8:
+            self._swizzle_pixels()
+
+
+    def is_converted(self) -> bool:
+        # A D3D11 texture is 64 bytes long, a D3D9 one 28, and its type and format must be D3D11 ones.
+        if len(self.resource_entry.data[0]) != d3d11.TEXTURE_LAYOUT.size:
+            return False
+        try:
+            self._load_d3d11()
+        except (ValueError, struct.error):
+            return False
+        return True
+
 
     def _load(self) -> None:
-        data = io.BytesIO(self.resource_entry.data[0])
-
-        data.seek(0x0)
-        _ = data.read(4)
-        _ = data.read(4)
-        _ = data.read(4)
-        _ = data.read(2)
-        _ = data.read(1)
-        _ = data.read(1)
-        self.d3d9_texture.format = d3d9.TextureFormat(struct.unpack('<l', data.read(4))[0])
-        self.d3d9_texture.width = struct.unpack('<H', data.read(2))[0]
-        self.d3d9_texture.height = struct.unpack('<H', data.read(2))[0]
-        self.d3d9_texture.depth = struct.unpack('B', data.read(1))[0]
-        self.d3d9_texture.mipmap_levels_count = struct.unpack('B', data.read(1))[0]
-        self.d3d9_texture.type = d3d9.TextureType(struct.unpack('b', data.read(1))[0])
-        _ = data.read(1)
+        data = BufferReader(self.resource_entry.data[0])
+
+        data.read(d3d9.TEXTURE_LAYOUT, 0x0, self.d3d9_texture)
+
+
+    def _load_d3d11(self) -> None:
+        data = BufferReader(self.resource_entry.data[0])
+
+        data.read(d3d11.TEXTURE_LAYOUT, 0x0, self.d3d11_texture)
 
 
     def _store(self) -> None:
-        data = io.BytesIO()
-
-        data.seek(0x0)
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<l', 0))
-        data.write(struct.pack('<l', self.d3d11_texture.type.value))
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<l', self.d3d11_texture.format.value))
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<H', self.d3d11_texture.width))
-        data.write(struct.pack('<H', self.d3d11_texture.height))
-        data.write(struct.pack('<H', self.d3d11_texture.depth))
-        data.write(struct.pack('<H', self.d3d11_texture.count))
-        data.write(struct.pack('B', 0))
-        data.write(struct.pack('B', self.d3d11_texture.mipmap_levels_count))
-        data.write(bytes(2)) # padding
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('<L', 0))
-
-        self.resource_entry.data[0] = data.getvalue()
+        data = BufferWriter(d3d11.TEXTURE_LAYOUT.size)
+
+        data.write(d3d11.TEXTURE_LAYOUT, 0x0, self.d3d11_texture)
+
+        self.resource_entry.data[0] = data.buffer
+
+
+    def _swizzle_pixels(self) -> None:
+        # D3D9 stores A8R8G8B8 pixels as BGRA bytes and R8G8B8A8_UNORM expects RGBA.
+        # The mip levels of all faces and slices follow each other, so a single view
+        # over all of their pixels swaps the red and blue channels in place.
+        depth = self.d3d9_texture.depth if self.d3d9_texture.type == d3d9.TextureType.VOLUME_TEXTURE else 1
+        size = self.d3d11_texture.count * sum(get_mipmap_level_size(self.d3d9_texture.format, self.d3d9_texture.width, self.d3d9_texture.height, depth, level) for level in range(self.d3d9_texture.mipmap_levels_count))
+
+        data = self.resource_entry.data[1]
+        if data is None:
+            return
+        if not isinstance(data, bytearray):
+            data = bytearray(data)
+        pixels = np.frombuffer(data, dtype=np.uint8, count=min(size, len(data)) & ~0x3).reshape(-1, 4)
+        pixels[:, [0, 2]] = pixels[:, [2, 0]]
+        self.resource_entry.data[1] = data
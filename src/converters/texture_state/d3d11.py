@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from enum import Enum
 
+from ..layout import Field, Layout
+
 
 class TextureAddressMode(Enum):
     WRAP = 1
@@ -31,3 +33,23 @@ class TextureState:
 
     def __post_init__(self):
         self.sampler_state = SamplerState()
+
+
+# Followed by the texture import.
+SAMPLER_STATE_LAYOUT = Layout(
+    Field('l', 'address_mode_u', TextureAddressMode),
+    Field('l', 'address_mode_v', TextureAddressMode),
+    Field('l', value=1),
+    Field('l', 'magnification_filter', TextureFilterType),
+    Field('l', 'minification_filter', TextureFilterType),
+    Field('l', value=1),
+    Field('4s', value=b'\xFF\xFF\x7F\xFF'),
+    Field('4s', value=b'\xFF\xFF\x7F\x7F'),
+    Field('L', 'max_anisotropy'),
+    Field('f', 'mipmap_lod_bias'),
+    Field('l', value=-1),
+    Field('?', value=False),
+    Field('3x'), # padding
+    Field('L', value=1),
+    Field('L'),
+)
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from enum import Enum
 
+from ..layout import Field, Layout
+
 
 class TextureAddressMode(Enum):
     WRAP = 1
@@ -32,3 +34,17 @@ class TextureState:
 
     def __post_init__(self):
         self.sampler_state = SamplerState()
+
+
+SAMPLER_STATE_LAYOUT = Layout(
+    Field('l', 'address_mode_u', TextureAddressMode),
+    Field('l', 'address_mode_v', TextureAddressMode),
+    Field('L'),
+    Field('l', 'magnification_filter', TextureFilterType),
+    Field('l', 'minification_filter', TextureFilterType),
+    Field('L'),
+    Field('L'),
+    Field('L', 'max_anisotropy'),
+    Field('f', 'mipmap_lod_bias'),
+    Field('L'),
+)
@@ -1,8 +1,8 @@
-import io
 import struct
 
 import bnd2
 
+from ..buffer import BufferReader, BufferWriter
 from . import d3d9
 from . import d3d11
 
@@ -46,41 +46,32 @@ class TextureState:
 
 
     def _load(self) -> None:
-        data = io.BytesIO(self.resource_entry.data[0])
+        data = BufferReader(self.resource_entry.data[0])
 
-        data.seek(0x0)
-        self.d3d9_texture_state.sampler_state.address_mode_u = d3d9.TextureAddressMode(struct.unpack('<l', data.read(4))[0])
-        self.d3d9_texture_state.sampler_state.address_mode_v = d3d9.TextureAddressMode(struct.unpack('<l', data.read(4))[0])
-        _ = data.read(4)
-        self.d3d9_texture_state.sampler_state.magnification_filter = d3d9.TextureFilterType(struct.unpack('<l', data.read(4))[0])
-        self.d3d9_texture_state.sampler_state.minification_filter = d3d9.TextureFilterType(struct.unpack('<l', data.read(4))[0])
-        _ = data.read(4)
-        _ = data.read(4)
-        self.d3d9_texture_state.sampler_state.max_anisotropy = struct.unpack('<L', data.read(4))[0]
-        self.d3d9_texture_state.sampler_state.mipmap_lod_bias = struct.unpack('<f', data.read(4))[0]
-        _ = data.read(4)
+        data.read(d3d9.SAMPLER_STATE_LAYOUT, 0x0, self.d3d9_texture_state.sampler_state)
+
+
+    def is_converted(self) -> bool:
+        # The D3D11 sampler state is longer and holds constants the D3D9 one doesn't.
+        if not d3d11.SAMPLER_STATE_LAYOUT.matches(self.resource_entry.data[0], 0x0):
+            return False
+        try:
+            self._load_d3d11()
+        except (ValueError, struct.error):
+            return False
+        return True
+
+
+    def _load_d3d11(self) -> None:
+        data = BufferReader(self.resource_entry.data[0])
+
+        data.read(d3d11.SAMPLER_STATE_LAYOUT, 0x0, self.d3d11_texture_state.sampler_state)
 
 
     def _store(self) -> None:
-        data = io.BytesIO()
-
-        data.seek(0x0)
-        data.write(struct.pack('<l', self.d3d11_texture_state.sampler_state.address_mode_u.value))
-        data.write(struct.pack('<l', self.d3d11_texture_state.sampler_state.address_mode_v.value))
-        data.write(struct.pack('<l', 1))
-        data.write(struct.pack('<l', self.d3d11_texture_state.sampler_state.magnification_filter.value))
-        data.write(struct.pack('<l', self.d3d11_texture_state.sampler_state.minification_filter.value))
-        data.write(struct.pack('<l', 1))
-        data.write(b'\xFF\xFF\x7F\xFF')
-        data.write(b'\xFF\xFF\x7F\x7F')
-        data.write(struct.pack('<L', self.d3d11_texture_state.sampler_state.max_anisotropy))
-        data.write(struct.pack('<f', self.d3d11_texture_state.sampler_state.mipmap_lod_bias))
-        data.write(struct.pack('<l', -1))
-        data.write(struct.pack('?', False))
-        data.write(bytes(3)) # padding
-        data.write(struct.pack('<L', 1))
-        data.write(struct.pack('<L', 0))
-        self.resource_entry.import_entries[0].offset = data.tell()
-        data.write(struct.pack('<L', 0))
-
-        self.resource_entry.data[0] = data.getvalue()
+        data = BufferWriter(d3d11.SAMPLER_STATE_LAYOUT.size + 4)
+
+        data.write(d3d11.SAMPLER_STATE_LAYOUT, 0x0, self.d3d11_texture_state.sampler_state)
+        self.resource_entry.import_entries[0].offset = d3d11.SAMPLER_STATE_LAYOUT.size
+
+        self.resource_entry.data[0] = data.buffer
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from enum import Enum
 
+from ..layout import Field, Layout
+
 
 class SemanticName(Enum):
     NONE = 0
@@ -42,3 +44,25 @@ class VertexDescriptor:
     elements_hash: int = None
     elements_count: int = None
     elements: list[Element] = None
+
+
+VERTEX_DESCRIPTOR_LAYOUT = Layout(
+    Field('L', value=1),
+    Field('L', 'elements_hash'),
+    Field('L'),
+    Field('B', 'elements_count'),
+    Field('B'),
+    Field('H'),
+)
+
+
+ELEMENT_LAYOUT = Layout(
+    Field('b', 'semantic_name', SemanticName),
+    Field('B'),
+    Field('B'),
+    Field('b'),
+    Field('l', 'format', Format),
+    Field('L', 'offset'),
+    Field('L'),
+    Field('L', 'vertex_stride'),
+)
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from enum import Enum
 
+from ..layout import Field, Layout
+
 
 class ElementType(Enum):
     NONE = 0
@@ -29,6 +31,23 @@ class DataType(Enum):
     UNUSED = 17
 
 
+DATA_TYPE_SIZES = {
+    DataType.FLOAT1: 4,
+    DataType.FLOAT2: 8,
+    DataType.FLOAT3: 12,
+    DataType.FLOAT4: 16,
+    DataType.UBYTE4: 4,
+    DataType.SHORT2: 4,
+    DataType.SHORT4: 8,
+    DataType.UBYTE4N: 4,
+    DataType.SHORT2N: 4,
+    DataType.SHORT4N: 8,
+    DataType.USHORT2N: 4,
+    DataType.USHORT4N: 8,
+    DataType.UNUSED: 0,
+}
+
+
 @dataclass
 class Element:
     vertex_stride: int = None
@@ -42,3 +61,26 @@ class VertexDescriptor:
     elements_hash: int = None
     elements_count: int = None
     elements: list[Element] = None
+
+
+VERTEX_DESCRIPTOR_LAYOUT = Layout(
+    Field('L'),
+    Field('L'),
+    Field('L', 'elements_hash'),
+    Field('B', 'elements_count'),
+    Field('B'),
+    Field('H'),
+)
+
+
+ELEMENT_LAYOUT = Layout(
+    Field('B'),
+    Field('B', 'vertex_stride'),
+    Field('H', 'offset'),
+    Field('l', 'data_type', DataType),
+    Field('B'),
+    Field('B'),
+    Field('B'),
+    Field('b', 'type', ElementType),
+    Field('L'),
+)
@@ -1,8 +1,8 @@
-import io
 import struct
 
 import bnd2
 
+from ..buffer import BufferReader, BufferWriter
 from . import d3d9
 from . import d3d11
 
@@ -63,50 +63,44 @@ class VertexDescriptor:
 
 
     def _load(self) -> None:
-        data = io.BytesIO(self.resource_entry.data[0])
+        data = BufferReader(self.resource_entry.data[0])
 
-        data.seek(0x0)
-        _ = data.read(4)
-        _ = data.read(4)
-        self.d3d9_vertex_descriptor.elements_hash = struct.unpack('<L', data.read(4))[0]
-        self.d3d9_vertex_descriptor.elements_count = struct.unpack('B', data.read(1))[0]
-        _ = data.read(1)
-        _ = data.read(2)
+        data.read(d3d9.VERTEX_DESCRIPTOR_LAYOUT, 0x0, self.d3d9_vertex_descriptor)
 
         self.d3d9_vertex_descriptor.elements = [d3d9.Element() for _ in range(self.d3d9_vertex_descriptor.elements_count)]
         for i, element in enumerate(self.d3d9_vertex_descriptor.elements):
-            data.seek(0x10 + i * 0x10)
-            _ = data.read(1)
-            element.vertex_stride = struct.unpack('B', data.read(1))[0]
-            element.offset = struct.unpack('<H', data.read(2))[0]
-            element.data_type = d3d9.DataType(struct.unpack('<l', data.read(4))[0])
-            _ = data.read(1)
-            _ = data.read(1)
-            _ = data.read(1)
-            element.type = d3d9.ElementType(struct.unpack('b', data.read(1))[0])
-            _ = data.read(4)
+            data.read(d3d9.ELEMENT_LAYOUT, 0x10 + i * 0x10, element)
+
+
+    def is_converted(self) -> bool:
+        # D3D11 elements are 0x14 bytes long instead of 0x10, so the size gives the layout away,
+        # except without elements, which is then taken as D3D9.
+        data = self.resource_entry.data[0]
+        if not d3d11.VERTEX_DESCRIPTOR_LAYOUT.matches(data, 0x0):
+            return False
+        try:
+            self._load_d3d11()
+        except (ValueError, struct.error):
+            return False
+        return self.d3d11_vertex_descriptor.elements_count > 0 and len(data) == 0x10 + self.d3d11_vertex_descriptor.elements_count * 0x14
+
+
+    def _load_d3d11(self) -> None:
+        data = BufferReader(self.resource_entry.data[0])
+
+        data.read(d3d11.VERTEX_DESCRIPTOR_LAYOUT, 0x0, self.d3d11_vertex_descriptor)
+
+        self.d3d11_vertex_descriptor.elements = [d3d11.Element() for _ in range(self.d3d11_vertex_descriptor.elements_count)]
+        for i, element in enumerate(self.d3d11_vertex_descriptor.elements):
+            data.read(d3d11.ELEMENT_LAYOUT, 0x10 + i * 0x14, element)
 
 
     def _store(self) -> None:
-        data = io.BytesIO()
+        data = BufferWriter(0x10 + self.d3d11_vertex_descriptor.elements_count * 0x14)
 
-        data.seek(0x0)
-        data.write(struct.pack('<L', 1))
-        data.write(struct.pack('<L', self.d3d11_vertex_descriptor.elements_hash))
-        data.write(struct.pack('<L', 0))
-        data.write(struct.pack('B', self.d3d11_vertex_descriptor.elements_count))
-        data.write(struct.pack('B', 0))
-        data.write(struct.pack('<H', 0))
+        data.write(d3d11.VERTEX_DESCRIPTOR_LAYOUT, 0x0, self.d3d11_vertex_descriptor)
 
         for i, element in enumerate(self.d3d11_vertex_descriptor.elements):
-            data.seek(0x10 + i * 0x14)
-            data.write(struct.pack('b', element.semantic_name.value))
-            data.write(struct.pack('B', 0))
-            data.write(struct.pack('B', 0))
-            data.write(struct.pack('b', 0))
-            data.write(struct.pack('<l', element.format.value))
-            data.write(struct.pack('<L', element.offset))
-            data.write(struct.pack('<L', 0))
-            data.write(struct.pack('<L', element.vertex_stride))
-
-        self.resource_entry.data[0] = data.getvalue()
+            data.write(d3d11.ELEMENT_LAYOUT, 0x10 + i * 0x14, element)
+
+        self.resource_entry.data[0] = data.buffer
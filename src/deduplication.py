@@ -0,0 +1,62 @@
+import struct
+import hashlib
+
+import bnd2
+
+
+# Types whose converted resources don't refer to their own ID, so identical ones can be shared.
+DEDUPLICATED_RESOURCE_TYPES = {
+    0, # Texture
+    10, # Vertex Descriptor
+    14, # Texture State
+    15, # Material State
+}
+
+
+def get_content_hashes(resource_entries: list[bnd2.ResourceEntry]) -> dict[int, str]:
+    # Hashes the converted resources of the deduplicated types by their type, data and
+    # imports, with every import standing for the hash of the imported resource.
+    # A resource importing anything without a hash (e.g. a missing resource) gets none.
+    resource_entries_by_id = {resource_entry.id: resource_entry for resource_entry in resource_entries if resource_entry.type in DEDUPLICATED_RESOURCE_TYPES}
+    content_hashes: dict[int, str | None] = {}
+
+    def get_content_hash(resource_id: int) -> str | None:
+        if resource_id in content_hashes:
+            return content_hashes[resource_id]
+        resource_entry = resource_entries_by_id.get(resource_id)
+        content_hashes[resource_id] = None
+        if resource_entry is None:
+            return None
+
+        content_hash = hashlib.blake2b(digest_size=20)
+        content_hash.update(struct.pack('<LL', resource_entry.type, len(resource_entry.import_entries)))
+        for import_entry in resource_entry.import_entries:
+            import_hash = get_content_hash(import_entry.id)
+            if import_hash is None:
+                return None
+            content_hash.update(struct.pack('<L', import_entry.offset))
+            content_hash.update(import_hash.encode())
+        for data in resource_entry.data:
+            content_hash.update(struct.pack('<q', -1 if data is None else len(data)))
+            if data is not None:
+                content_hash.update(data)
+        content_hashes[resource_id] = content_hash.hexdigest()
+        return content_hashes[resource_id]
+
+    for resource_id in resource_entries_by_id:
+        get_content_hash(resource_id)
+    return {resource_id: content_hash for resource_id, content_hash in content_hashes.items() if content_hash is not None}
+
+
+def remove_duplicate_resource_entries(bundle: bnd2.BundleV2) -> int:
+    # Identical resources were given the same ID and their importers were already
+    # changed to it, so only the first entry with every ID is kept.
+    resource_ids: set[int] = set()
+    resource_entries: list[bnd2.ResourceEntry] = []
+    for resource_entry in bundle.resource_entries:
+        if resource_entry.id not in resource_ids:
+            resource_ids.add(resource_entry.id)
+            resource_entries.append(resource_entry)
+    removed_count = len(bundle.resource_entries) - len(resource_entries)
+    bundle.resource_entries[:] = resource_entries
+    return removed_count
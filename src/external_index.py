@@ -0,0 +1,174 @@
+import os
+import json
+import hashlib
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass, asdict
+
+import bnd2
+
+from bundle_view import BundleView
+
+
+INDEX_VERSION = 1
+
+
+def hash_file(file_name: str) -> str:
+    file_hash = hashlib.blake2b(digest_size=16)
+    with open(file_name, 'rb') as fp:
+        while chunk := fp.read(1024 * 1024):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def normalize_file_name(file_name: str) -> str:
+    return os.path.normcase(os.path.abspath(file_name))
+
+
+@dataclass
+class IndexedBundle:
+    file_name: str = None
+    size: int = None
+    mtime: int = None
+    content_hash: str = None
+    resource_ids: list[int] = None
+
+
+# Persistent index of the resource IDs held by external bundles.
+# A bundle is reloaded only when its size or modification time changed
+# and its content hash doesn't match the indexed one anymore.
+class ExternalIndex:
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.bundles: dict[str, IndexedBundle] = {}
+
+
+    def load(self) -> None:
+        self.bundles = {}
+        if not os.path.isfile(self.file_name):
+            return
+
+        try:
+            with open(self.file_name, 'r') as fp:
+                index = json.load(fp)
+        except (OSError, ValueError):
+            print(f"Cannot read external index '{self.file_name}', rebuilding it.")
+            return
+
+        if index.get('version') != INDEX_VERSION:
+            return
+        for bundle in index['bundles']:
+            indexed_bundle = IndexedBundle(**bundle)
+            self.bundles[normalize_file_name(indexed_bundle.file_name)] = indexed_bundle
+
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_name)), exist_ok=True)
+        index = {
+            'version': INDEX_VERSION,
+            'bundles': [asdict(bundle) for bundle in self.bundles.values()],
+        }
+        # Write to a temporary file first, so a crash never leaves a truncated index behind.
+        temporary_file_name = f'{self.file_name}.{os.getpid()}.tmp'
+        with open(temporary_file_name, 'w') as fp:
+            json.dump(index, fp)
+        os.replace(temporary_file_name, self.file_name)
+
+
+    def update(self, external_file_names: list[str]) -> int:
+        updated_count = 0
+        for external_file_name in external_file_names:
+            key = normalize_file_name(external_file_name)
+            stat = os.stat(external_file_name)
+            indexed_bundle = self.bundles.get(key)
+            if indexed_bundle is not None and indexed_bundle.size == stat.st_size and indexed_bundle.mtime == stat.st_mtime_ns:
+                continue
+
+            content_hash = hash_file(external_file_name)
+            if indexed_bundle is None or indexed_bundle.content_hash != content_hash:
+                # Only the resource entries table is read, the resource data stays on disk.
+                with BundleView(external_file_name) as external_bundle:
+                    resource_ids = external_bundle.resource_ids
+                updated_count += 1
+            else:
+                resource_ids = indexed_bundle.resource_ids
+            self.bundles[key] = IndexedBundle(external_file_name, stat.st_size, stat.st_mtime_ns, content_hash, resource_ids)
+
+        for key in [key for key, bundle in self.bundles.items() if not os.path.isfile(bundle.file_name)]:
+            del self.bundles[key]
+
+        return updated_count
+
+
+    def locate(self, external_file_names: list[str]) -> dict[int, tuple[str, int]]:
+        # Maps each resource ID to the file name and resource entry index holding it.
+        # The first bundle holding a resource ID wins, like the order the bundles were chosen in.
+        locations: dict[int, tuple[str, int]] = {}
+        for external_file_name in external_file_names:
+            indexed_bundle = self.bundles[normalize_file_name(external_file_name)]
+            for entry_index, resource_id in enumerate(indexed_bundle.resource_ids):
+                locations.setdefault(resource_id, (external_file_name, entry_index))
+        return locations
+
+
+def locate_external_resources(external_file_names: list[str]) -> dict[int, tuple[str, int]]:
+    # Like ExternalIndex.locate, without a persistent index.
+    locations: dict[int, tuple[str, int]] = {}
+    for external_file_name in external_file_names:
+        with BundleView(external_file_name) as external_bundle:
+            for entry_index, resource_id in enumerate(external_bundle.resource_ids):
+                locations.setdefault(resource_id, (external_file_name, entry_index))
+    return locations
+
+
+# Resolves external resource IDs through the index. An external bundle is mapped
+# when one of its resources is requested for the first time, and only the data
+# of the requested resources is read from it. Every request returns a new
+# ResourceEntry, which the caller is free to modify. Closing unmaps the bundles,
+# they are mapped again when they are needed after that.
+class ExternalResources(Mapping):
+
+    def __init__(self, locations: dict[int, tuple[str, int]]):
+        self.locations = locations
+        self.bundles: dict[str, BundleView] = {}
+
+
+    def __getitem__(self, resource_id: int) -> tuple[BundleView, bnd2.ResourceEntry]:
+        file_name, entry_index = self.locations[resource_id]
+
+        external_bundle = self.bundles.get(file_name)
+        if external_bundle is None:
+            external_bundle = BundleView(file_name)
+            external_bundle.open()
+            self.bundles[file_name] = external_bundle
+
+        if entry_index < len(external_bundle.resource_ids) and external_bundle.resource_ids[entry_index] == resource_id:
+            resource_entry = external_bundle.get_resource_entry_at(entry_index)
+        else:
+            # The bundle changed after it was indexed.
+            resource_entry = external_bundle.get_resource_entry(resource_id)
+            if resource_entry is None:
+                raise KeyError(resource_id)
+        return external_bundle, resource_entry
+
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.locations)
+
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+
+    def close(self) -> None:
+        for external_bundle in self.bundles.values():
+            external_bundle.close()
+        self.bundles = {}
+
+
+    def __enter__(self) -> 'ExternalResources':
+        return self
+
+
+    def __exit__(self, *_) -> None:
+        self.close()
@@ -0,0 +1,43 @@
+import bnd2
+import numpy as np
+
+from converters.renderable import d3d9 as renderable_d3d9
+from vertex_buffers import read_renderable
+
+
+def narrow_index_buffer(resource_entry: bnd2.ResourceEntry) -> bool:
+    header, index_buffer, vertex_buffer, _ = read_renderable(resource_entry)
+    if index_buffer.format != renderable_d3d9.IndexFormat.INDEX_32 or index_buffer.indices_count == 0:
+        return False
+    buffers = resource_entry.data[1]
+    index_buffer_end = index_buffer.data_offset + 4 * index_buffer.indices_count
+    if index_buffer_end > len(buffers):
+        return False
+
+    # 0xFFFF is kept free, it cuts strips when it's a 16-bit index.
+    indices = np.frombuffer(buffers, dtype='<u4', count=index_buffer.indices_count, offset=index_buffer.data_offset)
+    if int(indices.max()) >= 0xFFFF:
+        return False
+
+    # The data after the index buffer moves up by a multiple of 0x10, keeping its alignment.
+    removed_size = (2 * index_buffer.indices_count) & ~0xF
+    narrowed_indices = np.zeros(4 * index_buffer.indices_count - removed_size, dtype=np.uint8)
+    narrowed_indices[:2 * index_buffer.indices_count] = indices.astype('<u2').view(np.uint8)
+
+    with memoryview(buffers) as view:
+        resource_entry.data[1] = b''.join((view[:index_buffer.data_offset], narrowed_indices.tobytes(), view[index_buffer_end:]))
+    if vertex_buffer.data_offset >= index_buffer_end:
+        vertex_buffer.data_offset -= removed_size
+    index_buffer.format = renderable_d3d9.IndexFormat.INDEX_16
+
+    data = bytearray(resource_entry.data[0])
+    renderable_d3d9.INDEX_BUFFER_LAYOUT.pack_fields_into(data, header['index_buffer_offset'], format=index_buffer.format)
+    renderable_d3d9.VERTEX_BUFFER_LAYOUT.pack_fields_into(data, header['vertex_buffer_offset'], data_offset=vertex_buffer.data_offset)
+    resource_entry.data[0] = data
+    return True
+
+
+def narrow_index_buffers(resource_entries: list[bnd2.ResourceEntry]) -> int:
+    # Works on the D3D9 renderables of a bundle before they are converted. The converter
+    # then sees 16-bit indices and sets the index size and the data size from them.
+    return sum(narrow_index_buffer(resource_entry) for resource_entry in resource_entries if resource_entry.type == 12)
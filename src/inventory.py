@@ -0,0 +1,156 @@
+import os
+import csv
+import json
+import struct
+import concurrent.futures
+from dataclasses import dataclass, field, asdict
+
+from batch import collect_file_names
+from bundle_view import BundleView
+from conversion import SUPPORTED_RESOURCE_TYPES
+from converters.texture import d3d9 as texture_d3d9
+from converters.renderable import d3d9 as renderable_d3d9
+from converters.material_state.material_state import D3D9_MATERIAL_STATE_ID_TO_D3D11_ALPHA_TO_COVERAGE_ENABLE
+
+
+# Offset of the format in a D3D9 texture, read apart from the layout so unknown formats can be reported.
+TEXTURE_FORMAT_OFFSET = 0x10
+
+TEXTURE_FORMAT_NAMES = {texture_format.value: texture_format.name for texture_format in texture_d3d9.TextureFormat}
+
+# Bundles scanned by a worker at once.
+BUNDLES_PER_TASK = 16
+
+
+@dataclass
+class BundleInventory:
+    file_name: str = None
+    file_size: int = 0
+    resources_count: int = 0
+    resources_count_by_type: dict[int, int] = field(default_factory=dict)
+    unknown_types: dict[int, int] = field(default_factory=dict)
+    external_ids: list[int] = field(default_factory=list)
+    texture_formats: dict[str, int] = field(default_factory=dict)
+    missing_material_state_ids: list[int] = field(default_factory=list)
+    renderables_count: int = 0
+    meshes_count: int = 0
+    error: str = None
+
+
+def get_texture_format_name(data: bytes) -> str:
+    format_value = struct.unpack_from('<l', data, TEXTURE_FORMAT_OFFSET)[0]
+    return TEXTURE_FORMAT_NAMES.get(format_value, f'0x{format_value & 0xFFFFFFFF :08X}')
+
+
+def scan_bundle(file_name: str) -> BundleInventory:
+    # Reads the header and the resource entries table, but only data[0] of the
+    # resources whose headers are inspected: textures, renderables and any resource
+    # with imports, which are stored in data[0].
+    inventory = BundleInventory(file_name, os.path.getsize(file_name))
+    try:
+        with BundleView(file_name) as bundle_view:
+            resource_ids = set(bundle_view.resource_ids)
+            external_ids: dict[int, None] = {}
+            inventory.resources_count = len(bundle_view.resource_ids)
+            for entry_index, resource_id in enumerate(bundle_view.resource_ids):
+                resource_type = bundle_view.get_resource_type_at(entry_index)
+                inventory.resources_count_by_type[resource_type] = inventory.resources_count_by_type.get(resource_type, 0) + 1
+                if resource_type not in SUPPORTED_RESOURCE_TYPES:
+                    inventory.unknown_types[resource_type] = inventory.unknown_types.get(resource_type, 0) + 1
+                if resource_type == 15 and resource_id not in D3D9_MATERIAL_STATE_ID_TO_D3D11_ALPHA_TO_COVERAGE_ENABLE:
+                    inventory.missing_material_state_ids.append(resource_id)
+                if resource_type not in (0, 12) and bundle_view.get_import_count_at(entry_index) == 0:
+                    continue
+
+                resource_entry = bundle_view.get_resource_entry_at(entry_index, header_only=True)
+                for import_entry in resource_entry.import_entries:
+                    if import_entry.id not in resource_ids:
+                        external_ids[import_entry.id] = None
+                if resource_type == 0:
+                    format_name = get_texture_format_name(resource_entry.data[0])
+                    inventory.texture_formats[format_name] = inventory.texture_formats.get(format_name, 0) + 1
+                elif resource_type == 12:
+                    header = renderable_d3d9.RENDERABLE_LAYOUT.unpack_from(resource_entry.data[0], 0x0)
+                    inventory.renderables_count += 1
+                    inventory.meshes_count += header['meshes_count']
+            inventory.external_ids = list(external_ids)
+    except Exception as exception:
+        inventory.error = f'{type(exception).__name__}: {exception}'
+    return inventory
+
+
+def scan_bundles(file_names: list[str], workers_count: int = None) -> list[BundleInventory]:
+    # The inventories are returned in the order of the file names.
+    workers_count = max(min(workers_count or os.cpu_count() or 1, len(file_names)), 1)
+    if workers_count == 1:
+        return [scan_bundle(file_name) for file_name in file_names]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers_count) as executor:
+        return list(executor.map(scan_bundle, file_names, chunksize=BUNDLES_PER_TASK))
+
+
+def save_json(file_name: str, inventories: list[BundleInventory]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+    with open(file_name, 'w') as fp:
+        json.dump({
+            'bundles': [dict(
+                asdict(inventory),
+                external_ids=[f'{resource_id :08X}' for resource_id in inventory.external_ids],
+                missing_material_state_ids=[f'{resource_id :08X}' for resource_id in inventory.missing_material_state_ids],
+            ) for inventory in inventories],
+        }, fp, indent=4)
+
+
+def save_csv(file_name: str, inventories: list[BundleInventory]) -> None:
+    # One row per bundle with a column for the count of every resource type found.
+    resource_types = sorted({resource_type for inventory in inventories for resource_type in inventory.resources_count_by_type})
+    os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+    with open(file_name, 'w', newline='') as fp:
+        writer = csv.writer(fp)
+        writer.writerow([
+            'file_name', 'file_size', 'resources_count', 'renderables_count', 'meshes_count', 'external_ids_count',
+            'unknown_types', 'texture_formats', 'missing_material_state_ids', 'error',
+            *(f'type_{resource_type}' for resource_type in resource_types),
+        ])
+        for inventory in inventories:
+            writer.writerow([
+                inventory.file_name, inventory.file_size, inventory.resources_count, inventory.renderables_count, inventory.meshes_count, len(inventory.external_ids),
+                ' '.join(f'{resource_type}:{count}' for resource_type, count in sorted(inventory.unknown_types.items())),
+                ' '.join(f'{format_name}:{count}' for format_name, count in sorted(inventory.texture_formats.items())),
+                ' '.join(f'{resource_id :08X}' for resource_id in inventory.missing_material_state_ids),
+                inventory.error or '',
+                *(inventory.resources_count_by_type.get(resource_type, 0) for resource_type in resource_types),
+            ])
+
+
+def print_summary(inventories: list[BundleInventory]) -> None:
+    resources_count_by_type: dict[int, int] = {}
+    for inventory in inventories:
+        for resource_type, count in inventory.resources_count_by_type.items():
+            resources_count_by_type[resource_type] = resources_count_by_type.get(resource_type, 0) + count
+    print(f"{sum(inventory.resources_count for inventory in inventories)} resource(s) in {len(inventories)} bundle(s), {sum(inventory.file_size for inventory in inventories) / (1024 * 1024) :.1f} MiB.")
+    for resource_type, count in sorted(resources_count_by_type.items()):
+        print(f"  type {resource_type :<4} {count :>8}{'' if resource_type in SUPPORTED_RESOURCE_TYPES else '  (not converted)'}")
+    missing_material_state_ids = sorted({resource_id for inventory in inventories for resource_id in inventory.missing_material_state_ids})
+    if len(missing_material_state_ids) > 0:
+        print(f"Material States missing from the alpha to coverage map: {' '.join(f'{resource_id :08X}' for resource_id in missing_material_state_ids)}")
+    for inventory in inventories:
+        if inventory.error is not None:
+            print(f"Failed to scan bundle '{inventory.file_name}': {inventory.error}")
+
+
+def run(input_patterns: list[str], file_pattern: str, output_file_name: str | None, workers_count: int = None) -> int:
+    file_names = [file_name for file_name, _ in collect_file_names(input_patterns, file_pattern)]
+    if len(file_names) == 0:
+        print("No bundles to scan.")
+        return 1
+
+    inventories = scan_bundles(file_names, workers_count)
+    if output_file_name is not None:
+        if output_file_name.lower().endswith('.json'):
+            save_json(output_file_name, inventories)
+        else:
+            save_csv(output_file_name, inventories)
+    print_summary(inventories)
+    if output_file_name is not None:
+        print(f"Saved the inventory to '{output_file_name}'.")
+    return 1 if any(inventory.error is not None for inventory in inventories) else 0
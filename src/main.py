@@ -1,107 +1,113 @@
-import io
-import struct
-import random
-import tkinter, tkinter.filedialog
-
-import bnd2
-
-from converters.texture.texture import Texture
-from converters.vertex_descriptor.vertex_descriptor import VertexDescriptor
-from converters.renderable.renderable import Renderable
-from converters.texture_state.texture_state import TextureState
-from converters.material_state.material_state import MaterialState
-
-
-def convert_resource_entry(bundle: bnd2.BundleV2, resource_entry: bnd2.ResourceEntry) -> None:
-    new_id = random.randint(0x00000000, 0xFFFFFFFF)
-
-    match resource_entry.type:
-        # Texture
-        case 0:
-            converter = Texture(resource_entry)
-            converter.convert()
-            bundle.change_resource_id(resource_entry.id, new_id)
-
-        # Material
-        case 1:
-            data = io.BytesIO(resource_entry.data[0])
-            data.seek(0x4)
-            data.write(struct.pack('<L', new_id))
-            resource_entry.data[0] = data.getvalue()
-            bundle.change_resource_id(resource_entry.id, new_id)
-
-        # Vertex Descriptor
-        case 10:
-            converter = VertexDescriptor(resource_entry)
-            converter.convert()
-            bundle.change_resource_id(resource_entry.id, new_id)
-
-        # Renderable
-        case 12:
-            converter = Renderable(resource_entry)
-            converter.convert()
-            bundle.change_resource_id(resource_entry.id, new_id)
-
-        # Texture State
-        case 14:
-            converter = TextureState(resource_entry)
-            converter.convert()
-            bundle.change_resource_id(resource_entry.id, new_id)
-
-        # Material State
-        case 15:
-            converter = MaterialState(resource_entry)
-            converter.convert()
-            bundle.change_resource_id(resource_entry.id, new_id)
-
-        # Model
-        case 42:
-            bundle.change_resource_id(resource_entry.id, new_id)
-
-
-def convert_bundle(bundle: bnd2.BundleV2, external_bundles: list[bnd2.BundleV2]) -> None:
-    external_resource_ids = bundle.get_external_resource_ids()
-    for external_resource_id in external_resource_ids:
-        for external_bundle in external_bundles:
-            external_resource_entry = external_bundle.get_resource_entry(external_resource_id)
-            if external_resource_entry is not None:
-                bundle.resource_entries.append(external_resource_entry)
-                break
-        else:
-            print(f"Cannot find external resource entry with ID {external_resource_id :08X}.")
-
-    for resource_entry in bundle.resource_entries:
-        convert_resource_entry(bundle, resource_entry)
-
-
-def load_external_bundles(external_file_names: list[str]):
-    external_bundles: list[bnd2.BundleV2] = []
-    for external_file_name in external_file_names:
-        external_bundle = bnd2.BundleV2(external_file_name)
-        external_bundle.load()
-        external_bundles.append(external_bundle)
-    return external_bundles
-
-
-def main() -> None:
-    tkinter.Tk().withdraw()
-
-    file_names = tkinter.filedialog.askopenfilenames()
-    bundles: list[bnd2.BundleV2] = []
-    for file_name in file_names:
-        bundle = bnd2.BundleV2(file_name)
-        bundle.load()
-        bundles.append(bundle)
-
-    external_file_names = tkinter.filedialog.askopenfilenames()
-
-    for bundle in bundles:
-        print(f"Converting bundle '{bundle.file_name}'...")
-        external_bundles = load_external_bundles(external_file_names)
-        convert_bundle(bundle, external_bundles)
-        bundle.save()
-        print("Done.")
-
-
-if __name__ == '__main__':
-    main()
+import argparse
+import os
+import sys
+
+import bnd2
+
+import batch
+from conversion import convert_bundle, load_bundle, load_external_resources
+from pipeline import Pipeline
+from resource_ids import HashIdAllocator
+
+
+def run_gui() -> None:
+    # Only the GUI needs tkinter, the command line starts faster without it.
+    import tkinter, tkinter.filedialog
+    tkinter.Tk().withdraw()
+
+    file_names = tkinter.filedialog.askopenfilenames()
+    external_file_names = tkinter.filedialog.askopenfilenames()
+    external_resources = load_external_resources(external_file_names)
+    id_allocator = HashIdAllocator()
+
+    def convert(bundle: bnd2.BundleV2) -> bnd2.BundleV2:
+        print(f"Converting bundle '{bundle.file_name}'...")
+        convert_bundle(bundle, external_resources, id_allocator)
+        return bundle
+
+    def save(bundle: bnd2.BundleV2) -> None:
+        bundle.save()
+        print(f"Saved '{bundle.file_name}'.")
+
+    # The next bundle is loaded and the previous one saved while a bundle is converted.
+    with external_resources:
+        Pipeline(load_bundle, convert, save).run(file_names)
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Convert bnd2 PC files from Burnout Paradise: The Ultimate Box to Burnout Paradise Remastered.")
+    parser.add_argument('input', nargs='*', help="bundle files, directories or glob patterns to convert (no input opens the file dialogs)")
+    parser.add_argument('-e', '--external', action='append', default=[], help="bundle file, directory or glob pattern with external resources (can be repeated)")
+    parser.add_argument('-o', '--output', help="directory to write the converted bundles to")
+    parser.add_argument('-c', '--cache', help="directory for the external index, the conversion cache and other cached data (default: OUTPUT/.cache)")
+    parser.add_argument('--cache-size', type=int, default=1024, help="maximum size of the conversion cache in MiB, 0 disables it (default: %(default)s)")
+    parser.add_argument('--ids', choices=['hash', 'random'], default='hash', help="how new resource IDs are chosen, 'hash' makes the output reproducible (default: %(default)s)")
+    parser.add_argument('--id-salt', default='', help="salt mixed into the hashed resource IDs")
+    parser.add_argument('--id-map', help="JSON file keeping the allocated resource IDs stable across runs")
+    parser.add_argument('-f', '--force', action='store_true', help="convert all bundles, even the ones which are up to date")
+    parser.add_argument('-p', '--pattern', default='*.BNDL', help="file name pattern used when searching directories (default: %(default)s)")
+    parser.add_argument('--repack-vertex-buffers', action='store_true', help="drop unused vertex elements and repack the vertex buffers using them")
+    parser.add_argument('--narrow-index-buffers', action='store_true', help="store 32-bit index buffers as 16-bit when all indices fit")
+    parser.add_argument('--deduplicate', action='store_true', help="keep a single copy of identical textures, vertex descriptors, texture and material states, with the same ID in every bundle")
+    parser.add_argument('--max-texture-size', type=int, default=None, metavar='SIZE', help="drop the mip levels of textures larger than SIZE pixels, e.g. 1024 for low-spec builds")
+    parser.add_argument('--profile', metavar='DIRECTORY', help="write a cProfile dump of every converted bundle to this directory")
+    parser.add_argument('--track-memory', action='store_true', help="record the peak and retained memory of every bundle and stage with tracemalloc (slower)")
+    parser.add_argument('--memory-budget', type=int, default=None, metavar='MIB', help="hold back new bundles while the bundles being converted are estimated to need more memory than this")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument('--scan', nargs='?', const='', metavar='FILE', help="only list what the input bundles hold, reading just their headers, and write it to a CSV file (or JSON if FILE ends with .json)")
+    parser.add_argument('--resource-jobs', type=int, default=1, metavar='N', help="number of processes converting the resources of a single bundle, for bundles with many resources (default: %(default)s)")
+    arguments = parser.parse_args()
+
+    if arguments.scan is not None and len(arguments.input) == 0:
+        parser.error("--scan needs input bundles")
+    if len(arguments.input) > 0 and arguments.output is None and arguments.scan is None:
+        parser.error("the following arguments are required when converting from the command line: -o/--output")
+    if arguments.jobs is not None and arguments.jobs < 1:
+        parser.error("-j/--jobs must be at least 1")
+    if arguments.resource_jobs < 1:
+        parser.error("--resource-jobs must be at least 1")
+    if arguments.max_texture_size is not None and arguments.max_texture_size < 1:
+        parser.error("--max-texture-size must be at least 1")
+    if arguments.cache is None and arguments.output is not None:
+        arguments.cache = os.path.join(arguments.output, '.cache')
+    return arguments
+
+
+def main() -> None:
+    arguments = parse_arguments()
+
+    if arguments.scan is not None:
+        # Imported here like tkinter, the scan reads the headers with the converters' layouts.
+        import inventory
+        sys.exit(inventory.run(arguments.input, arguments.pattern, arguments.scan or None, arguments.jobs))
+
+    if len(arguments.input) == 0:
+        run_gui()
+        return
+
+    options = batch.Options(
+        input_patterns=arguments.input,
+        external_patterns=arguments.external,
+        output_directory=arguments.output,
+        cache_directory=arguments.cache,
+        cache_size=arguments.cache_size * 1024 * 1024,
+        file_pattern=arguments.pattern,
+        workers_count=arguments.jobs,
+        resource_workers_count=arguments.resource_jobs,
+        id_mode=arguments.ids,
+        id_salt=arguments.id_salt,
+        id_map_file_name=arguments.id_map,
+        force=arguments.force,
+        profile_directory=arguments.profile,
+        repack_vertex_buffers=arguments.repack_vertex_buffers,
+        narrow_index_buffers=arguments.narrow_index_buffers,
+        max_texture_size=arguments.max_texture_size,
+        deduplicate_resources=arguments.deduplicate,
+        track_memory=arguments.track_memory,
+        memory_budget=arguments.memory_budget * 1024 * 1024 if arguments.memory_budget is not None else None,
+    )
+    sys.exit(batch.run(options))
+
+
+if __name__ == '__main__':
+    main()
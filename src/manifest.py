@@ -0,0 +1,114 @@
+import os
+import json
+from dataclasses import dataclass, asdict
+
+from external_index import hash_file, normalize_file_name
+
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class BuildRecord:
+    input_size: int = None
+    input_mtime: int = None
+    input_hash: str = None
+    external_resources: dict[str, str | None] = None
+    external_hashes: dict[str, str] = None
+    settings: str = None
+    output_size: int = None
+    output_mtime: int = None
+    allocated_ids: dict[str, int] = None
+
+
+# Records how every output bundle was built: the input bundle, the external
+# bundles which supplied its external resources and the settings used.
+# A bundle whose record still matches doesn't need to be converted again.
+class BuildManifest:
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.records: dict[str, BuildRecord] = {}
+
+
+    def load(self) -> None:
+        self.records = {}
+        if not os.path.isfile(self.file_name):
+            return
+
+        try:
+            with open(self.file_name, 'r') as fp:
+                manifest = json.load(fp)
+        except (OSError, ValueError):
+            print(f"Cannot read build manifest '{self.file_name}', converting all bundles.")
+            return
+
+        if manifest.get('version') != MANIFEST_VERSION:
+            return
+        for output_file_name, record in manifest['records'].items():
+            self.records[output_file_name] = BuildRecord(**record)
+
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_name)), exist_ok=True)
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'records': {output_file_name: asdict(record) for output_file_name, record in self.records.items()},
+        }
+        temporary_file_name = f'{self.file_name}.{os.getpid()}.tmp'
+        with open(temporary_file_name, 'w') as fp:
+            json.dump(manifest, fp)
+        os.replace(temporary_file_name, self.file_name)
+
+
+    def get_up_to_date_record(self, input_file_name: str, output_file_name: str, settings: str, external_locations: dict[int, tuple[str, int]], external_hashes: dict[str, str]) -> BuildRecord | None:
+        # external_locations and external_hashes describe the current external bundles, keyed by normalized file names.
+        record = self.records.get(normalize_file_name(output_file_name))
+        if record is None or record.settings != settings:
+            return None
+
+        try:
+            output_stat = os.stat(output_file_name)
+            input_stat = os.stat(input_file_name)
+        except OSError:
+            return None
+        if output_stat.st_size != record.output_size or output_stat.st_mtime_ns != record.output_mtime:
+            return None
+        if input_stat.st_size != record.input_size:
+            return None
+        if input_stat.st_mtime_ns != record.input_mtime:
+            if hash_file(input_file_name) != record.input_hash:
+                return None
+            record.input_mtime = input_stat.st_mtime_ns
+
+        for external_resource_id, external_file_name in record.external_resources.items():
+            location = external_locations.get(int(external_resource_id, 16))
+            current_file_name = normalize_file_name(location[0]) if location is not None else None
+            if current_file_name != external_file_name:
+                return None
+        for external_file_name, external_hash in record.external_hashes.items():
+            if external_hashes.get(external_file_name) != external_hash:
+                return None
+
+        return record
+
+
+    def update(self, input_file_name: str, input_hash: str, output_file_name: str, settings: str, external_resources: dict[int, str | None], external_hashes: dict[str, str], allocated_ids: dict[str, int]) -> None:
+        input_stat = os.stat(input_file_name)
+        output_stat = os.stat(output_file_name)
+        supplying_file_names = {normalize_file_name(file_name) for file_name in external_resources.values() if file_name is not None}
+        self.records[normalize_file_name(output_file_name)] = BuildRecord(
+            input_size=input_stat.st_size,
+            input_mtime=input_stat.st_mtime_ns,
+            input_hash=input_hash,
+            external_resources={f'{resource_id :08X}': normalize_file_name(file_name) if file_name is not None else None for resource_id, file_name in external_resources.items()},
+            external_hashes={file_name: external_hashes[file_name] for file_name in sorted(supplying_file_names)},
+            settings=settings,
+            output_size=output_stat.st_size,
+            output_mtime=output_stat.st_mtime_ns,
+            allocated_ids=allocated_ids,
+        )
+
+
+    def remove(self, output_file_name: str) -> None:
+        self.records.pop(normalize_file_name(output_file_name), None)
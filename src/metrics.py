@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import contextlib
+import tracemalloc
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+import bnd2
+
+
+PERCENTILES = (50, 90, 99)
+
+
+@dataclass
+class StageMetrics:
+    durations: list[float] = field(default_factory=list)
+    bytes_in: int = 0
+    bytes_out: int = 0
+    peak_memory: int = 0
+    retained_memory: int = 0
+
+
+def get_resource_size(resource_entry: bnd2.ResourceEntry) -> int:
+    return sum(len(data) for data in resource_entry.data if data is not None)
+
+
+def _get_prometheus_labels(stage_report: dict[str, Any]) -> str:
+    resource_type = '' if stage_report['resource_type'] is None else stage_report['resource_type']
+    return f'stage="{stage_report["stage"]}",resource_type="{resource_type}"'
+
+
+# Collects the durations and the bytes processed by every stage of a conversion,
+# per resource type (None for the stages working on whole bundles).
+# Every worker collects its own metrics, the parent merges them.
+#
+# Counters count events per resource type, like hits of the in-memory conversion memo.
+#
+# With memory tracking, the measured stages also record how far the traced memory
+# peaked above and how much of it remained allocated after the stage, from tracemalloc.
+class Metrics:
+
+    def __init__(self, track_memory: bool = False):
+        self.stages: dict[tuple[str, int | None], StageMetrics] = {}
+        self.counters: dict[tuple[str, int | None], int] = {}
+        self.track_memory = track_memory
+        # The highest traced memory of each measured stage in progress, outermost first.
+        self._memory_peaks: list[int] = []
+
+
+    def add(self, stage: str, resource_type: int | None, duration: float, bytes_in: int = 0, bytes_out: int = 0, peak_memory: int = 0, retained_memory: int = 0) -> None:
+        stage_metrics = self.stages.setdefault((stage, resource_type), StageMetrics())
+        stage_metrics.durations.append(duration)
+        stage_metrics.bytes_in += bytes_in
+        stage_metrics.bytes_out += bytes_out
+        stage_metrics.peak_memory = max(stage_metrics.peak_memory, peak_memory)
+        stage_metrics.retained_memory += retained_memory
+
+
+    def add_bytes(self, stage: str, resource_type: int | None, bytes_in: int = 0, bytes_out: int = 0) -> None:
+        stage_metrics = self.stages.setdefault((stage, resource_type), StageMetrics())
+        stage_metrics.bytes_in += bytes_in
+        stage_metrics.bytes_out += bytes_out
+
+
+    def count(self, name: str, resource_type: int | None = None, count: int = 1) -> None:
+        self.counters[(name, resource_type)] = self.counters.get((name, resource_type), 0) + count
+
+
+    @contextlib.contextmanager
+    def measure(self, stage: str, resource_type: int | None = None, resource_entry: bnd2.ResourceEntry = None) -> Iterator[None]:
+        # The size of the resource entry is taken before and after the stage.
+        bytes_in = get_resource_size(resource_entry) if resource_entry is not None else 0
+        memory_start = self._start_memory_tracking() if self.track_memory else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            bytes_out = get_resource_size(resource_entry) if resource_entry is not None else 0
+            peak_memory, retained_memory = self._stop_memory_tracking(memory_start) if self.track_memory else (0, 0)
+            self.add(stage, resource_type, duration, bytes_in, bytes_out, peak_memory, retained_memory)
+
+
+    def _start_memory_tracking(self) -> int:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        memory_start, peak = tracemalloc.get_traced_memory()
+        # Resetting the peak for this stage would lose the peak of the enclosing stage so far.
+        if len(self._memory_peaks) > 0:
+            self._memory_peaks[-1] = max(self._memory_peaks[-1], peak)
+        self._memory_peaks.append(memory_start)
+        tracemalloc.reset_peak()
+        return memory_start
+
+
+    def _stop_memory_tracking(self, memory_start: int) -> tuple[int, int]:
+        memory_end, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, self._memory_peaks.pop())
+        if len(self._memory_peaks) > 0:
+            self._memory_peaks[-1] = max(self._memory_peaks[-1], peak)
+        return peak - memory_start, memory_end - memory_start
+
+
+    def timed(self, stage: str, resource_type: int | None, function: Callable) -> Callable:
+        def timed_function(*args: Any, **kwargs: Any) -> Any:
+            with self.measure(stage, resource_type):
+                return function(*args, **kwargs)
+        return timed_function
+
+
+    def merge(self, other: 'Metrics') -> None:
+        for (stage, resource_type), other_stage_metrics in other.stages.items():
+            stage_metrics = self.stages.setdefault((stage, resource_type), StageMetrics())
+            stage_metrics.durations += other_stage_metrics.durations
+            stage_metrics.bytes_in += other_stage_metrics.bytes_in
+            stage_metrics.bytes_out += other_stage_metrics.bytes_out
+            stage_metrics.peak_memory = max(stage_metrics.peak_memory, other_stage_metrics.peak_memory)
+            stage_metrics.retained_memory += other_stage_metrics.retained_memory
+        for key, count in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + count
+
+
+    def get_count(self, stage: str) -> int:
+        return sum(len(stage_metrics.durations) for (name, _), stage_metrics in self.stages.items() if name == stage)
+
+
+    def get_peak_memory(self, stage: str) -> int:
+        return max((stage_metrics.peak_memory for (name, _), stage_metrics in self.stages.items() if name == stage), default=0)
+
+
+    def get_counter(self, name: str) -> int:
+        return sum(count for (counter_name, _), count in self.counters.items() if counter_name == name)
+
+
+    def get_counters_report(self) -> list[dict[str, Any]]:
+        return [{'name': name, 'resource_type': resource_type, 'count': count} for (name, resource_type), count in sorted(self.counters.items(), key=lambda item: (item[0][0], -1 if item[0][1] is None else item[0][1]))]
+
+
+    def get_report(self) -> list[dict[str, Any]]:
+        # Imported here, so processes which only collect metrics don't load NumPy.
+        import numpy as np
+        report = []
+        for (stage, resource_type), stage_metrics in sorted(self.stages.items(), key=lambda item: (item[0][0], -1 if item[0][1] is None else item[0][1])):
+            durations = np.array(stage_metrics.durations)
+            report.append({
+                'stage': stage,
+                'resource_type': resource_type,
+                'count': len(durations),
+                'total_seconds': float(durations.sum()),
+                'percentile_seconds': {str(percentile): float(value) for percentile, value in zip(PERCENTILES, np.percentile(durations, PERCENTILES) if len(durations) > 0 else [0.0] * len(PERCENTILES))},
+                'bytes_in': stage_metrics.bytes_in,
+                'bytes_out': stage_metrics.bytes_out,
+                'peak_memory': stage_metrics.peak_memory,
+                'retained_memory': stage_metrics.retained_memory,
+            })
+        return report
+
+
+    def save_json(self, file_name: str, **extra: Any) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+        with open(file_name, 'w') as fp:
+            json.dump(dict(extra, stages=self.get_report(), counters=self.get_counters_report()), fp, indent=4)
+
+
+    def save_prometheus(self, file_name: str) -> None:
+        # Prometheus text exposition format, e.g. for the node exporter's textfile collector.
+        lines = [
+            '# HELP bpr_converter_stage_seconds Time spent in a conversion stage.',
+            '# TYPE bpr_converter_stage_seconds summary',
+        ]
+        report = self.get_report()
+        for stage_report in report:
+            labels = _get_prometheus_labels(stage_report)
+            for percentile, value in stage_report['percentile_seconds'].items():
+                lines.append(f'bpr_converter_stage_seconds{{{labels},quantile="{int(percentile) / 100}"}} {value}')
+            lines.append(f'bpr_converter_stage_seconds_sum{{{labels}}} {stage_report["total_seconds"]}')
+            lines.append(f'bpr_converter_stage_seconds_count{{{labels}}} {stage_report["count"]}')
+        for name, kind, description in (('peak_memory', 'gauge', 'Highest traced memory above the start of a conversion stage'), ('retained_memory', 'counter', 'Traced memory still allocated after a conversion stage')):
+            lines.append(f'# HELP bpr_converter_stage_{name}_bytes {description}.')
+            lines.append(f'# TYPE bpr_converter_stage_{name}_bytes {kind}')
+            for stage_report in report:
+                labels = _get_prometheus_labels(stage_report)
+                lines.append(f'bpr_converter_stage_{name}_bytes{{{labels}}} {stage_report[name]}')
+        for direction in ('in', 'out'):
+            lines.append(f'# HELP bpr_converter_stage_bytes_{direction}_total Bytes going {direction} of a conversion stage.')
+            lines.append(f'# TYPE bpr_converter_stage_bytes_{direction}_total counter')
+            for stage_report in report:
+                labels = _get_prometheus_labels(stage_report)
+                lines.append(f'bpr_converter_stage_bytes_{direction}_total{{{labels}}} {stage_report[f"bytes_{direction}"]}')
+        lines.append('# HELP bpr_converter_events_total Events counted during the conversion.')
+        lines.append('# TYPE bpr_converter_events_total counter')
+        for counter_report in self.get_counters_report():
+            resource_type = '' if counter_report['resource_type'] is None else counter_report['resource_type']
+            lines.append(f'bpr_converter_events_total{{event="{counter_report["name"]}",resource_type="{resource_type}"}} {counter_report["count"]}')
+
+        os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+        temporary_file_name = f'{file_name}.{os.getpid()}.tmp'
+        with open(temporary_file_name, 'w') as fp:
+            fp.write('\n'.join(lines) + '\n')
+        os.replace(temporary_file_name, file_name)
+
+
+    def print_summary(self) -> None:
+        totals: dict[str, tuple[int, float]] = {}
+        for (stage, _), stage_metrics in self.stages.items():
+            count, seconds = totals.get(stage, (0, 0.0))
+            totals[stage] = (count + len(stage_metrics.durations), seconds + sum(stage_metrics.durations))
+        for stage, (count, seconds) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            print(f"  {stage :<20} {count :>8} x {seconds :>10.3f} s")
+        hits_count = self.get_counter('memo_hits')
+        misses_count = self.get_counter('memo_misses')
+        if hits_count + misses_count > 0:
+            print(f"  Conversion memo: {hits_count} hit(s), {misses_count} miss(es), {hits_count / (hits_count + misses_count) :.0%} hit rate.")
@@ -0,0 +1,164 @@
+import concurrent.futures
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import bnd2
+
+from conversion import RESOURCES_PER_CHUNK, convert_resource_entry
+from conversion_cache import ConversionCache
+from metrics import Metrics
+
+
+# Data blocks from this size on go through shared memory instead of being pickled.
+SHARED_MEMORY_MIN_SIZE = 64 * 1024
+
+
+# A data block in the shared memory of a chunk.
+@dataclass
+class SharedBlock:
+    offset: int = None
+    size: int = None
+
+
+@dataclass
+class ResourceTask:
+    id: int = None
+    type: int = None
+    data: list[bytes | SharedBlock | None] = None
+    import_entries: list[tuple[int, int]] = None
+
+
+@dataclass
+class ResourceResult:
+    # None for the data blocks which didn't change, the shared blocks which changed were written back.
+    data: list[bytes | SharedBlock | None] = None
+    import_offsets: list[int] = None
+
+
+def create_chunk(resource_entries: list[bnd2.ResourceEntry]) -> tuple[shared_memory.SharedMemory | None, list[ResourceTask]]:
+    shared_size = sum(len(data) for resource_entry in resource_entries for data in resource_entry.data if data is not None and len(data) >= SHARED_MEMORY_MIN_SIZE)
+    shared = shared_memory.SharedMemory(create=True, size=shared_size) if shared_size > 0 else None
+    tasks = []
+    offset = 0
+    for resource_entry in resource_entries:
+        task_data = []
+        for data in resource_entry.data:
+            if data is not None and len(data) >= SHARED_MEMORY_MIN_SIZE:
+                shared.buf[offset:offset + len(data)] = data
+                task_data.append(SharedBlock(offset, len(data)))
+                offset += len(data)
+            else:
+                task_data.append(data)
+        tasks.append(ResourceTask(resource_entry.id, resource_entry.type, task_data, [(import_entry.id, import_entry.offset) for import_entry in resource_entry.import_entries]))
+    return shared, tasks
+
+
+def convert_chunk(tasks: list[ResourceTask], shared_name: str | None, conversion_cache: ConversionCache | None) -> tuple[list[ResourceResult], Metrics]:
+    # Runs in a worker process. Every task becomes a resource entry of its own,
+    # converted the same way as in convert_bundle, apart from the new ID.
+    # The shared blocks are read through views of the shared memory, not copied,
+    # and the ones the converter didn't replace aren't sent back at all.
+    metrics = Metrics()
+    shared = shared_memory.SharedMemory(name=shared_name) if shared_name is not None else None
+    views: list[memoryview] = []
+    try:
+        results = []
+        for task in tasks:
+            data = [shared.buf[block.offset:block.offset + block.size] if isinstance(block, SharedBlock) else block for block in task.data]
+            views.extend(block for block in data if isinstance(block, memoryview))
+            resource_entry = bnd2.ResourceEntry()
+            resource_entry.id = task.id
+            resource_entry.type = task.type
+            resource_entry.data = list(data)
+            resource_entry.import_entries = []
+            for import_id, import_offset in task.import_entries:
+                import_entry = bnd2.ImportEntry()
+                import_entry.id = import_id
+                import_entry.offset = import_offset
+                resource_entry.import_entries.append(import_entry)
+
+            convert_resource_entry(resource_entry, resource_entry.id, conversion_cache, metrics)
+
+            result_data = []
+            for block, original_data, converted_data in zip(task.data, data, resource_entry.data):
+                if converted_data is original_data:
+                    result_data.append(None)
+                elif isinstance(block, SharedBlock) and converted_data is not None and len(converted_data) == block.size:
+                    shared.buf[block.offset:block.offset + block.size] = converted_data
+                    result_data.append(block)
+                else:
+                    result_data.append(bytes(converted_data) if converted_data is not None else None)
+            results.append(ResourceResult(result_data, [import_entry.offset for import_entry in resource_entry.import_entries]))
+        return results, metrics
+    finally:
+        # The shared memory can only be closed once no view of it is left.
+        for view in views:
+            view.release()
+        if shared is not None:
+            shared.close()
+
+
+def release_chunk(shared: shared_memory.SharedMemory | None) -> None:
+    if shared is not None:
+        shared.close()
+        shared.unlink()
+
+
+def finish_chunk(resource_entries: list[bnd2.ResourceEntry], shared: shared_memory.SharedMemory | None, future: concurrent.futures.Future, metrics: Metrics) -> None:
+    # Puts the converted data of a finished chunk back into its entries and frees its shared memory.
+    try:
+        results, chunk_metrics = future.result()
+        metrics.merge(chunk_metrics)
+        for resource_entry, result in zip(resource_entries, results):
+            for i, block in enumerate(result.data):
+                if isinstance(block, SharedBlock):
+                    resource_entry.data[i] = bytes(shared.buf[block.offset:block.offset + block.size])
+                elif block is not None:
+                    resource_entry.data[i] = block
+            for import_entry, import_offset in zip(resource_entry.import_entries, result.import_offsets):
+                import_entry.offset = import_offset
+    finally:
+        release_chunk(shared)
+
+
+def convert_resource_entries_in_parallel(resource_entries: list[bnd2.ResourceEntry], workers_count: int, conversion_cache: ConversionCache | None, metrics: Metrics) -> None:
+    # The resources are converted in chunks by a pool of processes and their converted
+    # data is put back into the same entries, so the bundle keeps its order. Only the
+    # conversion itself runs in parallel, the new IDs are given by the caller afterwards.
+    # A chunk is only copied to shared memory when a worker is about to be free for it,
+    # so no more than one chunk per worker (and one waiting) is in shared memory at a time.
+    # The pool lives only as long as the bundle's conversion: a batch worker couldn't
+    # exit while it had a pool of its own, which is only shut down at interpreter exit.
+    chunks_count = (len(resource_entries) + RESOURCES_PER_CHUNK - 1) // RESOURCES_PER_CHUNK
+    workers_count = max(min(workers_count, chunks_count), 1)
+    running_chunks: dict[concurrent.futures.Future, tuple[list[bnd2.ResourceEntry], shared_memory.SharedMemory | None]] = {}
+
+    def finish_first_chunks() -> None:
+        done, _ = concurrent.futures.wait(running_chunks, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            chunk_resource_entries, shared = running_chunks.pop(future)
+            finish_chunk(chunk_resource_entries, shared, future, metrics)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers_count) as executor:
+        try:
+            for start in range(0, len(resource_entries), RESOURCES_PER_CHUNK):
+                if len(running_chunks) > workers_count:
+                    finish_first_chunks()
+                chunk_resource_entries = resource_entries[start:start + RESOURCES_PER_CHUNK]
+                shared, tasks = create_chunk(chunk_resource_entries)
+                try:
+                    future = executor.submit(convert_chunk, tasks, shared.name if shared is not None else None, conversion_cache)
+                except Exception:
+                    release_chunk(shared)
+                    raise
+                running_chunks[future] = (chunk_resource_entries, shared)
+
+            while len(running_chunks) > 0:
+                finish_first_chunks()
+        finally:
+            for future, (_, shared) in running_chunks.items():
+                future.cancel()
+                if shared is not None:
+                    # Waits for the worker, it may still be using the shared memory.
+                    concurrent.futures.wait([future])
+                    release_chunk(shared)
@@ -0,0 +1,115 @@
+import queue
+import threading
+from collections.abc import Callable, Iterable
+from typing import Any
+
+
+_END = object()
+
+
+class _Stop(Exception):
+    pass
+
+
+# Runs the load, convert and save stages of the bundles at the same time,
+# so reading, converting and writing bundles overlap. The stages are joined by
+# bounded queues, which caps how many bundles are resident at once.
+#
+# A single conversion thread keeps the bundles in order. More of them only help
+# when the conversion spends its time outside of the GIL (zlib, NumPy).
+class Pipeline:
+
+    def __init__(self, load: Callable[[Any], Any], convert: Callable[[Any], Any], save: Callable[[Any], None], converters_count: int = 1, queue_size: int = 2):
+        self.load = load
+        self.convert = convert
+        self.save = save
+        self.converters_count = converters_count
+        self.queue_size = queue_size
+        self._stop = threading.Event()
+        self._errors: list[BaseException] = []
+        self._errors_lock = threading.Lock()
+
+
+    def run(self, items: Iterable[Any]) -> None:
+        loaded_queue = queue.Queue(self.queue_size)
+        converted_queue = queue.Queue(self.queue_size)
+
+        loader = threading.Thread(target=self._run_stage, args=(self._load_all, items, loaded_queue), name='loader')
+        converters = [threading.Thread(target=self._run_stage, args=(self._convert_all, loaded_queue, converted_queue), name=f'converter-{i}') for i in range(self.converters_count)]
+        saver = threading.Thread(target=self._run_stage, args=(self._save_all, converted_queue, None), name='saver')
+
+        loader.start()
+        for converter in converters:
+            converter.start()
+        saver.start()
+
+        loader.join()
+        for converter in converters:
+            converter.join()
+        self._put(converted_queue, _END, force=True)
+        saver.join()
+
+        if len(self._errors) > 0:
+            raise self._errors[0]
+
+
+    def _run_stage(self, stage: Callable, source: Any, destination: queue.Queue | None) -> None:
+        try:
+            stage(source, destination)
+        except _Stop:
+            pass
+        except BaseException as e:
+            with self._errors_lock:
+                self._errors.append(e)
+            self._stop.set()
+
+
+    def _load_all(self, items: Iterable[Any], loaded_queue: queue.Queue) -> None:
+        try:
+            for item in items:
+                self._check_stop()
+                self._put(loaded_queue, self.load(item))
+        finally:
+            for _ in range(self.converters_count):
+                self._put(loaded_queue, _END, force=True)
+
+
+    def _convert_all(self, loaded_queue: queue.Queue, converted_queue: queue.Queue) -> None:
+        while (item := self._get(loaded_queue)) is not _END:
+            self._check_stop()
+            self._put(converted_queue, self.convert(item))
+
+
+    def _save_all(self, converted_queue: queue.Queue, _: None) -> None:
+        while (item := self._get(converted_queue)) is not _END:
+            self._check_stop()
+            self.save(item)
+
+
+    def _check_stop(self) -> None:
+        if self._stop.is_set():
+            raise _Stop()
+
+
+    def _get(self, source: queue.Queue) -> Any:
+        while True:
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                self._check_stop()
+
+
+    def _put(self, destination: queue.Queue, item: Any, force: bool = False) -> None:
+        # After a failure, the end markers still have to get through, so the consumers finish.
+        while True:
+            try:
+                destination.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self._stop.is_set():
+                    if not force:
+                        raise _Stop()
+                    try:
+                        destination.get_nowait()
+                    except queue.Empty:
+                        pass
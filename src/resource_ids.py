@@ -0,0 +1,119 @@
+import os
+import json
+import random
+import struct
+import hashlib
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Mapping
+
+
+# IDs which are never handed out.
+INVALID_IDS = {
+    0x00000000,
+    0xFFFFFFFF,
+}
+
+
+def get_id_key(bundle_name: str, resource_id: int) -> str:
+    return f'{bundle_name}:{resource_id :08X}'
+
+
+def get_shared_id_key(content_hash: str) -> str:
+    return f'shared:{content_hash}'
+
+
+# The allocators hand out IDs which are neither allocated to another resource
+# nor reserved. Reserving the original IDs of a bundle keeps a new ID from
+# matching a resource which wasn't renamed yet. A key which already owns an
+# ID among the used IDs (e.g. a shared one) gets it again.
+class IdAllocator(ABC):
+
+    def __init__(self, used_ids: Mapping[int, str | None] = None):
+        # Maps every used ID to the key it was allocated to, None if it's reserved.
+        self.used_ids: dict[int, str | None] = dict(used_ids or {})
+        self.owned_ids: dict[str, int] = {key: new_id for new_id, key in self.used_ids.items() if key is not None}
+        self.allocated_ids: dict[str, int] = {}
+
+
+    def reserve(self, resource_ids: Iterable[int]) -> None:
+        for resource_id in resource_ids:
+            self.used_ids.setdefault(resource_id, None)
+
+
+    def allocate(self, bundle_name: str, resource_id: int) -> int:
+        return self._allocate(get_id_key(bundle_name, resource_id))
+
+
+    # Resources with the same content get the same ID, in every bundle.
+    def allocate_shared(self, content_hash: str) -> int:
+        key = get_shared_id_key(content_hash)
+        if key in self.allocated_ids:
+            return self.allocated_ids[key]
+        return self._allocate(key)
+
+
+    def _allocate(self, key: str) -> int:
+        new_id = self.owned_ids.get(key)
+        if new_id is None:
+            new_id = self._get_preferred_id(key)
+        attempt = 0
+        while new_id is None or new_id in INVALID_IDS or self.used_ids.get(new_id, key) != key:
+            new_id = self._generate_id(key, attempt)
+            attempt += 1
+        self.used_ids[new_id] = key
+        self.allocated_ids[key] = new_id
+        return new_id
+
+
+    def _get_preferred_id(self, key: str) -> int | None:
+        return None
+
+
+    @abstractmethod
+    def _generate_id(self, key: str, attempt: int) -> int:
+        ...
+
+
+# The original behavior, every run produces different IDs.
+class RandomIdAllocator(IdAllocator):
+
+    def _generate_id(self, key: str, attempt: int) -> int:
+        return random.randint(0x00000000, 0xFFFFFFFF)
+
+
+# Derives the IDs from a hash of the bundle name, the original ID and a salt,
+# so converting the same bundle again produces the same IDs.
+# IDs from an ID map take precedence, so IDs stay stable even when
+# a collision was resolved differently in another run.
+class HashIdAllocator(IdAllocator):
+
+    def __init__(self, salt: str = '', id_map: dict[str, int] = None, used_ids: Mapping[int, str | None] = None):
+        super().__init__(used_ids)
+        self.salt = salt
+        self.id_map = id_map or {}
+        for key, new_id in self.id_map.items():
+            self.used_ids[new_id] = key
+
+
+    def _get_preferred_id(self, key: str) -> int | None:
+        return self.id_map.get(key)
+
+
+    def _generate_id(self, key: str, attempt: int) -> int:
+        id_hash = hashlib.blake2b(f'{self.salt}\0{key}\0{attempt}'.encode(), digest_size=4)
+        return struct.unpack('<L', id_hash.digest())[0]
+
+
+def load_id_map(file_name: str) -> dict[str, int]:
+    if file_name is None or not os.path.isfile(file_name):
+        return {}
+    with open(file_name, 'r') as fp:
+        return {key: int(new_id, 16) for key, new_id in json.load(fp).items()}
+
+
+def save_id_map(file_name: str, id_map: dict[str, int]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+    temporary_file_name = f'{file_name}.{os.getpid()}.tmp'
+    with open(temporary_file_name, 'w') as fp:
+        json.dump({key: f'{new_id :08X}' for key, new_id in sorted(id_map.items())}, fp, indent=0)
+    os.replace(temporary_file_name, file_name)
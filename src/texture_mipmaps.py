@@ -0,0 +1,54 @@
+import bnd2
+
+from converters.texture import d3d9 as texture_d3d9
+from converters.texture.texture import D3D9_TEXTURE_FORMAT_BLOCK_SIZE, D3D9_TEXTURE_FORMAT_PIXEL_SIZE, get_mipmap_level_size
+
+
+def get_dropped_mipmap_levels_count(texture: texture_d3d9.Texture, max_size: int) -> int:
+    # The smallest level is always kept, even if it's still larger than the maximum size.
+    size = max(texture.width, texture.height)
+    dropped_count = 0
+    while size > max_size and dropped_count < texture.mipmap_levels_count - 1:
+        size >>= 1
+        dropped_count += 1
+    return dropped_count
+
+
+def cap_texture_size(resource_entry: bnd2.ResourceEntry, max_size: int) -> bool:
+    texture = texture_d3d9.Texture()
+    texture_d3d9.TEXTURE_LAYOUT.unpack_from(resource_entry.data[0], 0x0, texture)
+    if texture.format not in D3D9_TEXTURE_FORMAT_BLOCK_SIZE and texture.format not in D3D9_TEXTURE_FORMAT_PIXEL_SIZE:
+        return False
+    dropped_count = get_dropped_mipmap_levels_count(texture, max_size)
+    if dropped_count == 0:
+        return False
+
+    # Every face holds its whole mip chain, the largest level first.
+    faces_count = 6 if texture.type == texture_d3d9.TextureType.CUBE_TEXTURE else 1
+    depth = texture.depth if texture.type == texture_d3d9.TextureType.VOLUME_TEXTURE else 1
+    level_sizes = [get_mipmap_level_size(texture.format, texture.width, texture.height, depth, level) for level in range(texture.mipmap_levels_count)]
+    dropped_size = sum(level_sizes[:dropped_count])
+    face_size = sum(level_sizes)
+    pixels = resource_entry.data[1]
+    if pixels is None or len(pixels) < faces_count * face_size:
+        return False
+
+    with memoryview(pixels) as view:
+        resource_entry.data[1] = b''.join(view[face * face_size + dropped_size:(face + 1) * face_size] for face in range(faces_count))
+
+    texture.width = max(texture.width >> dropped_count, 1)
+    texture.height = max(texture.height >> dropped_count, 1)
+    if texture.type == texture_d3d9.TextureType.VOLUME_TEXTURE:
+        texture.depth = max(texture.depth >> dropped_count, 1)
+    texture.mipmap_levels_count -= dropped_count
+
+    data = bytearray(resource_entry.data[0])
+    texture_d3d9.TEXTURE_LAYOUT.pack_fields_into(data, 0x0, width=texture.width, height=texture.height, depth=texture.depth, mipmap_levels_count=texture.mipmap_levels_count)
+    resource_entry.data[0] = data
+    return True
+
+
+def cap_texture_sizes(resource_entries: list[bnd2.ResourceEntry], max_size: int) -> int:
+    # Works on the D3D9 textures of a bundle before they are converted. The top mip levels
+    # larger than the maximum size are dropped as they are, nothing is re-encoded.
+    return sum(cap_texture_size(resource_entry, max_size) for resource_entry in resource_entries if resource_entry.type == 0)
@@ -0,0 +1,167 @@
+from dataclasses import dataclass
+
+import bnd2
+import numpy as np
+
+from converters.buffer import BufferReader
+from converters.vertex_descriptor import d3d9 as vertex_descriptor_d3d9
+from converters.renderable import d3d9 as renderable_d3d9
+
+
+# Elements which no D3D11 input layout reads.
+UNUSED_DATA_TYPES = {
+    vertex_descriptor_d3d9.DataType.UNUSED,
+}
+
+UNUSED_ELEMENT_TYPES = {
+    vertex_descriptor_d3d9.ElementType.NONE,
+}
+
+
+@dataclass
+class Repack:
+    vertex_descriptor: vertex_descriptor_d3d9.VertexDescriptor = None
+    vertex_stride: int = None
+    # (source offset, destination offset, size) of every kept element.
+    copies: list[tuple[int, int, int]] = None
+
+
+def read_vertex_descriptor(resource_entry: bnd2.ResourceEntry) -> vertex_descriptor_d3d9.VertexDescriptor:
+    data = BufferReader(resource_entry.data[0])
+    vertex_descriptor = vertex_descriptor_d3d9.VertexDescriptor()
+    data.read(vertex_descriptor_d3d9.VERTEX_DESCRIPTOR_LAYOUT, 0x0, vertex_descriptor)
+    vertex_descriptor.elements = [vertex_descriptor_d3d9.Element() for _ in range(vertex_descriptor.elements_count)]
+    for i, element in enumerate(vertex_descriptor.elements):
+        data.read(vertex_descriptor_d3d9.ELEMENT_LAYOUT, 0x10 + i * 0x10, element)
+    return vertex_descriptor
+
+
+def plan_repack(vertex_descriptor: vertex_descriptor_d3d9.VertexDescriptor) -> Repack | None:
+    # Packs the kept elements one after another in their original order.
+    if vertex_descriptor.elements_count == 0:
+        return None
+    vertex_stride = vertex_descriptor.elements[0].vertex_stride
+    if any(element.vertex_stride != vertex_stride for element in vertex_descriptor.elements):
+        return None
+
+    copies = []
+    offset = 0
+    for element in sorted(vertex_descriptor.elements, key=lambda element: element.offset):
+        if element.data_type in UNUSED_DATA_TYPES or element.type in UNUSED_ELEMENT_TYPES:
+            continue
+        size = vertex_descriptor_d3d9.DATA_TYPE_SIZES[element.data_type]
+        if element.offset + size > vertex_stride:
+            return None
+        copies.append((element.offset, offset, size))
+        offset += size
+
+    if offset == vertex_stride or offset == 0:
+        return None
+    return Repack(vertex_descriptor, offset, copies)
+
+
+def read_renderable(resource_entry: bnd2.ResourceEntry) -> tuple[dict, renderable_d3d9.IndexBuffer, renderable_d3d9.VertexBuffer, np.ndarray]:
+    data = BufferReader(resource_entry.data[0])
+    header = data.read(renderable_d3d9.RENDERABLE_LAYOUT, 0x0)
+    index_buffer = renderable_d3d9.IndexBuffer()
+    vertex_buffer = renderable_d3d9.VertexBuffer()
+    data.read(renderable_d3d9.INDEX_BUFFER_LAYOUT, header['index_buffer_offset'], index_buffer)
+    data.read(renderable_d3d9.VERTEX_BUFFER_LAYOUT, header['vertex_buffer_offset'], vertex_buffer)
+    meshes_offsets = data.read_numpy('<u4', header['meshes_count'], header['meshes_offset'])
+    meshes = data.read_records(renderable_d3d9.MESH_DTYPE, meshes_offsets)
+    return header, index_buffer, vertex_buffer, meshes
+
+
+def get_vertex_descriptor_id(resource_entry: bnd2.ResourceEntry, vertex_descriptor_ids: set[int]) -> int | None:
+    # Returns the only vertex descriptor all meshes of the renderable use, if there is one.
+    _, _, _, meshes = read_renderable(resource_entry)
+    used_ids = [import_entry.id for import_entry in resource_entry.import_entries if import_entry.id in vertex_descriptor_ids]
+    if len(used_ids) == 0 or len(used_ids) != int(meshes['vertex_descriptors_count'].astype(np.int64).sum()):
+        return None
+    if any(used_id != used_ids[0] for used_id in used_ids) or np.any(meshes['vertex_descriptors_count'] != 1):
+        return None
+    return used_ids[0]
+
+
+def can_repack_vertex_buffer(resource_entry: bnd2.ResourceEntry, vertex_stride: int) -> bool:
+    _, _, vertex_buffer, _ = read_renderable(resource_entry)
+    return vertex_buffer.data_size % vertex_stride == 0 and vertex_buffer.data_offset + vertex_buffer.data_size <= len(resource_entry.data[1])
+
+
+def repack_vertex_buffer(resource_entry: bnd2.ResourceEntry, repack: Repack) -> None:
+    header, index_buffer, vertex_buffer, _ = read_renderable(resource_entry)
+    vertex_stride = repack.vertex_descriptor.elements[0].vertex_stride
+    buffers = resource_entry.data[1]
+    vertex_buffer_end = vertex_buffer.data_offset + vertex_buffer.data_size
+
+    # Copies every kept element of all vertices at once, through strided views of both buffers.
+    vertices_count = vertex_buffer.data_size // vertex_stride
+    packed_data_size = vertices_count * repack.vertex_stride
+    vertices = np.frombuffer(buffers, dtype=np.uint8, count=vertex_buffer.data_size, offset=vertex_buffer.data_offset).reshape(vertices_count, vertex_stride)
+    # The data after the vertex buffer moves up by a multiple of 0x10, keeping its alignment.
+    removed_size = (vertex_buffer.data_size - packed_data_size) & ~0xF
+    packed_vertices = np.zeros(vertex_buffer.data_size - removed_size, dtype=np.uint8)
+    packed_view = packed_vertices[:packed_data_size].reshape(vertices_count, repack.vertex_stride)
+    for source_offset, destination_offset, size in repack.copies:
+        packed_view[:, destination_offset:destination_offset + size] = vertices[:, source_offset:source_offset + size]
+
+    with memoryview(buffers) as view:
+        resource_entry.data[1] = b''.join((view[:vertex_buffer.data_offset], packed_vertices.tobytes(), view[vertex_buffer_end:]))
+    if index_buffer.data_offset >= vertex_buffer_end:
+        index_buffer.data_offset -= removed_size
+    vertex_buffer.data_size = packed_data_size
+
+    data = bytearray(resource_entry.data[0])
+    renderable_d3d9.INDEX_BUFFER_LAYOUT.pack_fields_into(data, header['index_buffer_offset'], data_offset=index_buffer.data_offset)
+    renderable_d3d9.VERTEX_BUFFER_LAYOUT.pack_fields_into(data, header['vertex_buffer_offset'], data_size=vertex_buffer.data_size)
+    resource_entry.data[0] = data
+
+
+def write_vertex_descriptor(resource_entry: bnd2.ResourceEntry, repack: Repack) -> None:
+    # The kept elements are copied as they are, with only their offset and vertex stride changed.
+    elements = repack.vertex_descriptor.elements
+    kept_indices = [i for i in sorted(range(len(elements)), key=lambda i: elements[i].offset) if elements[i].data_type not in UNUSED_DATA_TYPES and elements[i].type not in UNUSED_ELEMENT_TYPES]
+
+    with memoryview(resource_entry.data[0]) as view:
+        data = bytearray(view[:0x10]) + b''.join(view[0x10 + i * 0x10:0x20 + i * 0x10] for i in kept_indices)
+    vertex_descriptor_d3d9.VERTEX_DESCRIPTOR_LAYOUT.pack_fields_into(data, 0x0, elements_count=len(kept_indices))
+    for i, (_, offset, _) in enumerate(repack.copies):
+        vertex_descriptor_d3d9.ELEMENT_LAYOUT.pack_fields_into(data, 0x10 + i * 0x10, offset=offset, vertex_stride=repack.vertex_stride)
+    resource_entry.data[0] = data
+
+
+def repack_vertex_buffers(resource_entries: list[bnd2.ResourceEntry]) -> int:
+    # Works on the D3D9 resources of a bundle before they are converted. A vertex descriptor
+    # is repacked only if all renderables using it can be rewritten with it, which needs
+    # all their meshes to use just this descriptor, so their vertex buffer has one layout.
+    vertex_descriptors = {resource_entry.id: resource_entry for resource_entry in resource_entries if resource_entry.type == 10}
+    renderables = [resource_entry for resource_entry in resource_entries if resource_entry.type == 12]
+
+    repacks: dict[int, Repack] = {}
+    for resource_id, resource_entry in vertex_descriptors.items():
+        repack = plan_repack(read_vertex_descriptor(resource_entry))
+        if repack is not None:
+            repacks[resource_id] = repack
+
+    users: dict[int, list[bnd2.ResourceEntry]] = {}
+    rejected_ids: set[int] = set()
+    for resource_entry in renderables:
+        vertex_descriptor_id = get_vertex_descriptor_id(resource_entry, vertex_descriptors.keys())
+        if vertex_descriptor_id is None:
+            rejected_ids.update(import_entry.id for import_entry in resource_entry.import_entries)
+        else:
+            users.setdefault(vertex_descriptor_id, []).append(resource_entry)
+
+    repacked_count = 0
+    for resource_id, repack in repacks.items():
+        if resource_id in rejected_ids or resource_id not in users:
+            continue
+        vertex_stride = repack.vertex_descriptor.elements[0].vertex_stride
+        if not all(can_repack_vertex_buffer(resource_entry, vertex_stride) for resource_entry in users[resource_id]):
+            continue
+        for resource_entry in users[resource_id]:
+            repack_vertex_buffer(resource_entry, repack)
+        write_vertex_descriptor(vertex_descriptors[resource_id], repack)
+        repacked_count += 1
+    return repacked_count
+